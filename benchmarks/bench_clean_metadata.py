@@ -0,0 +1,130 @@
+"""Микробенчмарк TrackProcessor.clean_metadata.
+
+Сравнивает прежнюю реализацию (шесть последовательных re.sub) с
+предкомпилированной версией — без кэша и с прогретым кэшем. Перед замером
+проверяет, что результаты обеих реализаций совпадают, в том числе на
+случайных строках из фрагментов тегов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_clean_metadata.py [число_повторов]
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.track_processor import TrackProcessor, _clean_metadata_cached  # noqa: E402
+
+# Строки тегов в том виде, в каком они встречаются в реальных библиотеках
+CORPUS = [
+    "Bohemian Rhapsody",
+    "Queen",
+    "Smells Like Teen Spirit (Remastered 2021)",
+    "Nirvana",
+    "Tarkan - Şımarık [muzofon.com]",
+    "Kuzu Kuzu (www.mp3skull.com)",
+    "Sezen Aksu",
+    "Hotel California - Eagles [downloaded from zaycev.net]",
+    "Lose Yourself (feat. Eminem) [Explicit]",
+    "Blinding Lights downloaded from mp3party.net",
+    "Ты не один (muzmo.ru)",
+    "Кино",
+    "Группа крови [Скачано с sefon.me]",
+    "Levitating (feat. DaBaby) https://t.me/music_channel",
+    "Dua Lipa",
+    "Daft Punk, Pharrell Williams",
+    "Get Lucky (Radio Edit)   ",
+    "  Numb   Linkin Park  ",
+    "Stairway to Heaven - Remaster from www.music.com",
+    "Dancing Queen [www.ABBA-fans.org]",
+    "Shape of You (Official Audio) (zvuk.cc)",
+    "Ed Sheeran",
+    "Rolling in the Deep",
+    "Adele",
+    "Gangnam Style (강남스타일)",
+    "PSY",
+    "Despacito (Remix) [feat. Justin Bieber] (hitmos.io)",
+    "Luis Fonsi, Daddy Yankee",
+    "Billie Jean http://www.mp3juices.cc/billie-jean",
+    "Michael Jackson",
+]
+
+# Перекрывающиеся шаблоны: одно общее выражение давало здесь другой результат
+CORPUS += [
+    "[y.net] from [y.net]",
+    "Song from (radio.ru) [x.com]",
+    "Track downloaded from [site.org] from x.io",
+    "(mp3.cc) from http://a.me/b",
+]
+
+# Тот же корпус в нижнем регистре: read_audio_file передает теги как есть,
+# и регистр в них бывает любой, а часть шаблонов нечувствительна к регистру
+CORPUS += [text.lower() for text in CORPUS]
+
+
+FRAGMENTS = ["[y.net]", "(a.ru)", "from ", "downloaded ", "http://x.io/y", "[", "]", "(", ")",
+             "song", " ", "x.com", "feat. ", "Кино"]
+
+
+def fuzz_corpus(count: int, seed: int = 0):
+    """Случайные строки из фрагментов тегов, в которых шаблоны мусора перекрываются"""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+
+def legacy_clean_metadata(text: str) -> str:
+    """Реализация до компиляции выражений"""
+    if not text:
+        return text
+    text = re.sub(r'https?://\S+', '', text)
+    text = re.sub(r'\[(.*?(?:\.(?:com|ru|net|org|cc|me|io))[^\]]*?)\]', '', text)
+    text = re.sub(r'\((.*?(?:\.(?:com|ru|net|org|cc|me|io))[^)]*?)\)', '', text)
+    text = re.sub(r'(?i)downloaded\s+from\s+.*?(?=\s|$)', '', text)
+    text = re.sub(r'(?i)from\s+.*?(?:\.(?:com|ru|net|org|cc|me|io)).*?(?=\s|$)', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def run_legacy():
+    for text in CORPUS:
+        legacy_clean_metadata(text)
+
+
+def run_uncached():
+    _clean_metadata_cached.cache_clear()
+    for text in CORPUS:
+        TrackProcessor.clean_metadata(text)
+
+
+def run_cached():
+    for text in CORPUS:
+        TrackProcessor.clean_metadata(text)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    mismatches = [
+        (text, legacy_clean_metadata(text), TrackProcessor.clean_metadata(text))
+        for text in CORPUS + fuzz_corpus(20000)
+        if legacy_clean_metadata(text) != TrackProcessor.clean_metadata(text)
+    ]
+    for text, old, new in mismatches:
+        print(f"Расхождение: {text!r}: {old!r} -> {new!r}")
+    if mismatches:
+        sys.exit(1)
+
+    run_cached()  # прогрев кэша
+    calls = repeat * len(CORPUS)
+    for name, func in (("прежняя (6 x re.sub)", run_legacy),
+                       ("скомпилированная, без кэша", run_uncached),
+                       ("скомпилированная, с кэшем", run_cached)):
+        elapsed = timeit.timeit(func, number=repeat)
+        print(f"{name:<28} {elapsed / calls * 1e6:8.2f} мкс/вызов")
+
+
+if __name__ == '__main__':
+    main()
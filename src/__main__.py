@@ -1,5 +1,6 @@
 import os
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
 from src.gui.main_window import SpotifyMergerWindow
 
@@ -10,4 +11,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Необходимо для пула процессов в собранном PyInstaller приложении
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -0,0 +1,207 @@
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+# Версия потокового формата бэкапа (JSON Lines)
+BACKUP_VERSION = '2.0'
+# Версия исходного формата (единый JSON документ)
+LEGACY_BACKUP_VERSION = '1.0'
+
+def format_track(track_item: Dict[str, Any]) -> Dict[str, Any]:
+    """Преобразует элемент ответа /me/tracks в запись бэкапа"""
+    track = track_item['track']
+    return {
+        'name': track['name'],
+        'artist': track['artists'][0]['name'],
+        'album': track['album']['name'],
+        'spotify_uri': track['uri'],
+        'duration_ms': track['duration_ms'],
+        'preview_url': track.get('preview_url'),
+        'added_at': track_item.get('added_at')
+    }
+
+class BackupWriter:
+    """Потоковая запись бэкапа в формате JSON Lines
+
+    Первая строка файла - заголовок, далее по строке на трек, последняя строка -
+    итоговая запись. Треки записываются по мере получения, поэтому память не
+    растет с размером библиотеки, а при сбое уже сохраненные треки не теряются.
+    """
+
+    def __init__(self, path: str, spotify_user: str, total: int, **header_fields):
+        self.path = path
+        self.count = 0
+        self._file: Optional[TextIO] = open(path, 'w', encoding='utf-8')
+        header = {
+            'type': 'header',
+            'version': BACKUP_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'spotify_user': spotify_user,
+            'total': total
+        }
+        header.update(header_fields)
+        self._write(header)
+        self._file.flush()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write('\n')
+
+    def write_tracks(self, tracks: List[Dict[str, Any]]) -> None:
+        """Записывает порцию треков и сбрасывает ее на диск"""
+        for track in tracks:
+            self._write(dict(track, type='track'))
+        self.count += len(tracks)
+        self._file.flush()
+
+    def close(self, complete: bool = True) -> None:
+        """Записывает итоговую запись и закрывает файл"""
+        if self._file is None:
+            return
+        self._write({
+            'type': 'footer',
+            'total': self.count,
+            'complete': complete,
+            'finished_at': datetime.now().isoformat()
+        })
+        self._file.close()
+        self._file = None
+
+    def __enter__(self) -> 'BackupWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(complete=exc_type is None)
+
+def _read_first_line(path: str) -> str:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.readline()
+
+def _parse_header(line: str) -> Optional[Dict[str, Any]]:
+    """Возвращает заголовок потокового бэкапа или None для других форматов"""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(record, dict) and record.get('type') == 'header':
+        return record
+    return None
+
+def read_backup_header(path: str) -> Dict[str, Any]:
+    """Возвращает метаданные бэкапа без списка треков"""
+    header = _parse_header(_read_first_line(path))
+    if header is not None:
+        return header
+
+    with open(path, 'r', encoding='utf-8') as f:
+        backup_data = json.load(f)
+    if not isinstance(backup_data, dict) or 'tracks' not in backup_data:
+        raise ValueError("Неверный формат файла бэкапа")
+    return {key: value for key, value in backup_data.items() if key != 'tracks'}
+
+def read_backup_footer(path: str) -> Optional[Dict[str, Any]]:
+    """Возвращает итоговую запись потокового бэкапа или None, если ее нет"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        tail = f.read().decode('utf-8', errors='replace')
+    lines = [line for line in tail.splitlines() if line.strip()]
+    if not lines:
+        return None
+    try:
+        record = json.loads(lines[-1])
+    except json.JSONDecodeError:
+        return None
+    if isinstance(record, dict) and record.get('type') == 'footer':
+        return record
+    return None
+
+def is_backup_complete(path: str) -> bool:
+    """Проверяет, что бэкап записан до конца
+
+    Бэкап формата 1.0 пишется одним документом и всегда полный. Потоковый
+    бэкап полный, только если он заканчивается итоговой записью с complete=True:
+    у прерванного или отмененного бэкапа ее нет или в ней complete=False.
+    """
+    if _parse_header(_read_first_line(path)) is None:
+        return True
+    footer = read_backup_footer(path)
+    return bool(footer and footer.get('complete'))
+
+def iter_backup_tracks(path: str) -> Iterator[Dict[str, Any]]:
+    """Лениво читает треки из бэкапа; поддерживает потоковый формат и формат 1.0"""
+    if _parse_header(_read_first_line(path)) is None:
+        # Формат 1.0 хранит весь бэкап одним JSON документом
+        with open(path, 'r', encoding='utf-8') as f:
+            backup_data = json.load(f)
+        if not isinstance(backup_data, dict) or 'tracks' not in backup_data:
+            raise ValueError("Неверный формат файла бэкапа")
+        yield from backup_data['tracks']
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Последняя строка может быть оборвана, если запись бэкапа прервалась
+                logger.warning(f"Пропущена поврежденная строка {line_number} в бэкапе {path}")
+                continue
+            if record.get('type') == 'track':
+                yield record
+
+def resolve_base_backup(path: str, header: Dict[str, Any]) -> Optional[str]:
+    """Возвращает путь к базовому бэкапу инкрементального бэкапа"""
+    base_path = header.get('base_backup')
+    if not base_path:
+        return None
+    if os.path.exists(base_path):
+        return base_path
+    # Бэкапы могли перенести вместе, ищем базовый рядом с текущим
+    sibling = os.path.join(os.path.dirname(os.path.abspath(path)), os.path.basename(base_path))
+    if os.path.exists(sibling):
+        return sibling
+    raise ValueError(f"Не найден базовый бэкап: {base_path}")
+
+def iter_backup_chain(path: str) -> Iterator[str]:
+    """Выдает путь бэкапа и пути всей цепочки его базовых бэкапов, от нового к старому"""
+    visited = set()
+    current: Optional[str] = path
+
+    while current:
+        current_key = os.path.abspath(current)
+        if current_key in visited:
+            raise ValueError("Цепочка бэкапов содержит цикл")
+        visited.add(current_key)
+        yield current
+        current = resolve_base_backup(current, read_backup_header(current))
+
+def find_incomplete_backup(path: str) -> Optional[str]:
+    """Возвращает первый недописанный бэкап цепочки или None, если вся цепочка полная"""
+    for current in iter_backup_chain(path):
+        if not is_backup_complete(current):
+            return current
+    return None
+
+def iter_snapshot_tracks(path: str) -> Iterator[Dict[str, Any]]:
+    """Читает полный снимок библиотеки: треки бэкапа и всей цепочки его базовых бэкапов
+
+    Повторяющиеся треки выдаются один раз, начиная с самого нового бэкапа.
+    """
+    seen_uris = set()
+    for current in iter_backup_chain(path):
+        for track in iter_backup_tracks(current):
+            uri = track.get('spotify_uri')
+            if uri in seen_uris:
+                continue
+            if uri:
+                seen_uris.add(uri)
+            yield track
+
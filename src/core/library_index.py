@@ -0,0 +1,158 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+from src.utils.settings import CONFIG_DIR
+
+logger = logging.getLogger(__name__)
+
+class LibraryIndex:
+    """Постоянный индекс локальной библиотеки на основе SQLite
+
+    Для каждого файла хранится отпечаток (путь, размер, время изменения),
+    извлеченные метаданные и найденный трек Spotify. Пока отпечаток файла
+    не меняется, повторно читать теги и искать трек не нужно.
+    """
+
+    # Через сколько записей фиксировать транзакцию
+    COMMIT_INTERVAL = 200
+
+    # Версия очистки тегов (TrackProcessor.clean_metadata); увеличивается при
+    # каждом изменении результата очистки, чтобы перечитать сохраненные теги
+    METADATA_VERSION = 1
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(CONFIG_DIR, 'library_index.db')
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                readable INTEGER NOT NULL,
+                title TEXT,
+                artist TEXT,
+                duration REAL,
+                spotify_uri TEXT,
+                spotify_name TEXT,
+                spotify_artist TEXT,
+                updated_at REAL NOT NULL,
+                isrc TEXT
+            )
+        """)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """Обновляет схему индекса, созданного предыдущими версиями"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(files)")}
+        if 'isrc' not in columns:
+            self._conn.execute("ALTER TABLE files ADD COLUMN isrc TEXT")
+            # Теги файлов без найденного трека нужно перечитать, чтобы получить ISRC
+            self._conn.execute("UPDATE files SET mtime = -1 WHERE spotify_uri IS NULL")
+            logger.info("Индекс библиотеки обновлен: добавлена колонка ISRC")
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < self.METADATA_VERSION:
+            # Теги, очищенные прежней версией, перечитываются; найденные треки сохраняются
+            updated = self._conn.execute("UPDATE files SET mtime = -1 WHERE spotify_uri IS NULL").rowcount
+            self._conn.execute(f"PRAGMA user_version = {self.METADATA_VERSION}")
+            if updated:
+                logger.info(f"Индекс библиотеки обновлен: теги {updated} файлов будут перечитаны")
+
+    @staticmethod
+    def fingerprint(file_path: str) -> Tuple[int, float]:
+        """Возвращает отпечаток файла: размер и время изменения"""
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime
+
+    def lookup(self, file_path: str, size: int, mtime: float) -> Optional[Dict[str, Any]]:
+        """Возвращает запись индекса, если файл не изменился с момента индексации"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, readable, title, artist, duration, spotify_uri, spotify_name, spotify_artist, isrc "
+                "FROM files WHERE path = ?",
+                (file_path,)
+            ).fetchone()
+
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+
+        return {
+            'readable': bool(row[2]),
+            'title': row[3],
+            'artist': row[4],
+            'duration': row[5],
+            'spotify_uri': row[6],
+            'spotify_name': row[7],
+            'spotify_artist': row[8],
+            'isrc': row[9]
+        }
+
+    def store_metadata(self, file_path: str, size: int, mtime: float,
+                       metadata: Optional[Tuple[Optional[str], Optional[str], Optional[float]]],
+                       isrc: Optional[str] = None) -> None:
+        """Сохраняет метаданные файла; найденный ранее трек Spotify при этом сбрасывается"""
+        title, artist, duration = metadata if metadata else (None, None, None)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files "
+                "(path, size, mtime, readable, title, artist, duration, spotify_uri, spotify_name, spotify_artist, updated_at, isrc) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL, NULL, ?, ?)",
+                (file_path, size, mtime, 1 if metadata else 0, title, artist, duration, time.time(), isrc)
+            )
+            self._write_done()
+
+    def set_spotify_track(self, file_path: str, track: Dict[str, Any]) -> None:
+        """Запоминает трек Spotify, сопоставленный файлу"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE files SET spotify_uri = ?, spotify_name = ?, spotify_artist = ?, updated_at = ? WHERE path = ?",
+                (track['uri'], track['name'], track['artists'][0]['name'], time.time(), file_path)
+            )
+            self._write_done()
+
+    def prune(self, root: str, existing_paths: Iterable[str]) -> int:
+        """Удаляет из индекса файлы каталога root, которых больше нет на диске"""
+        existing = set(existing_paths)
+        prefix = os.path.join(root, '')
+        with self._lock:
+            indexed = [
+                row[0] for row in self._conn.execute(
+                    "SELECT path FROM files WHERE substr(path, 1, ?) = ?",
+                    (len(prefix), prefix)
+                )
+            ]
+            removed = [(path,) for path in indexed if path not in existing]
+            if removed:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+            self._conn.commit()
+            self._pending_writes = 0
+
+        if removed:
+            logger.info(f"Из индекса библиотеки удалено {len(removed)} отсутствующих файлов")
+        return len(removed)
+
+    def _write_done(self) -> None:
+        """Фиксирует транзакцию после накопления нескольких изменений"""
+        self._pending_writes += 1
+        if self._pending_writes >= self.COMMIT_INTERVAL:
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def flush(self) -> None:
+        """Фиксирует все накопленные изменения"""
+        with self._lock:
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def close(self) -> None:
+        """Фиксирует изменения и закрывает соединение с базой"""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
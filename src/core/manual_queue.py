@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Set
+from src.core.matcher import Metadata, strip_match_forms
+from src.utils.settings import CONFIG_DIR, get_setting
+
+logger = logging.getLogger(__name__)
+
+class ManualItem(NamedTuple):
+    """Файл, ожидающий ручного выбора трека, и найденные для него кандидаты"""
+    path: str
+    metadata: Metadata
+    candidates: List[Dict[str, Any]]
+
+class ManualQueue:
+    """Постоянная очередь файлов, требующих ручного выбора трека
+
+    Очередь хранится в SQLite и привязана к запуску (плейлисту), поэтому
+    неразрешенные файлы переживают отмену и падение программы. Файлы можно
+    разбирать, пока автоматическая обработка продолжает пополнять очередь:
+    put вызывается из потока обработки, get и resolve - из интерфейса.
+    Выданный get файл остается в базе до вызова resolve. Для prefetch_count
+    ближайших файлов вызывается prefetch(item), чтобы подготовить данные
+    диалога выбора заранее.
+    """
+
+    # Сколько хранить записи очередей прошлых запусков, в секундах
+    RETENTION = 30 * 24 * 3600
+
+    def __init__(self, db_path: Optional[str] = None, prefetch_count: Optional[int] = None,
+                 prefetch: Optional[Callable[[ManualItem], None]] = None):
+        self.db_path = db_path or os.path.join(CONFIG_DIR, 'manual_queue.db')
+        self.prefetch_count = max(0, int(prefetch_count if prefetch_count is not None
+                                         else get_setting('manual_prefetch_count')))
+        self.prefetch = prefetch
+        self.run_key: Optional[str] = None
+        self._order: Deque[str] = deque()
+        self._items: Dict[str, ManualItem] = {}
+        self._prefetched: Set[str] = set()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS manual_queue (
+                run_key TEXT NOT NULL,
+                path TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                candidates TEXT NOT NULL,
+                added_at REAL NOT NULL,
+                PRIMARY KEY (run_key, path)
+            )
+        """)
+        self._conn.execute("DELETE FROM manual_queue WHERE added_at < ?", (time.time() - self.RETENTION,))
+        self._conn.commit()
+
+    def open(self, run_key: str) -> int:
+        """Привязывает очередь к запуску и загружает его неразрешенные файлы
+
+        Возвращает число загруженных файлов.
+        """
+        with self._lock:
+            self.run_key = run_key
+            self._order.clear()
+            self._items.clear()
+            self._prefetched.clear()
+            rows = self._conn.execute(
+                "SELECT path, metadata, candidates FROM manual_queue WHERE run_key = ? ORDER BY added_at",
+                (run_key,)
+            ).fetchall()
+            for path, metadata, candidates in rows:
+                self._items[path] = ManualItem(path, tuple(json.loads(metadata)), json.loads(candidates))
+                self._order.append(path)
+        if rows:
+            logger.info(f"Восстановлена очередь ручного выбора: {len(rows)} файлов")
+        self._prefetch_upcoming()
+        return len(rows)
+
+    def put(self, path: str, metadata: Metadata, candidates: List[Dict[str, Any]]) -> bool:
+        """Ставит файл в очередь; возвращает False, если файл уже в очереди"""
+        item = ManualItem(path, tuple(metadata), list(candidates))
+        with self._lock:
+            if path in self._items:
+                return False
+            self._items[path] = item
+            self._order.append(path)
+            if self.run_key is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO manual_queue (run_key, path, metadata, candidates, added_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.run_key, path, json.dumps(item.metadata, ensure_ascii=False),
+                     json.dumps([strip_match_forms(track) for track in item.candidates], ensure_ascii=False),
+                     time.time())
+                )
+                self._conn.commit()
+        self._prefetch_upcoming()
+        return True
+
+    def get(self) -> Optional[ManualItem]:
+        """Выдает следующий файл очереди или None, если очередь пуста"""
+        with self._lock:
+            if not self._order:
+                return None
+            path = self._order.popleft()
+            item = self._items.pop(path)
+            self._prefetched.discard(path)
+        self._prefetch_upcoming()
+        return item
+
+    def take_all(self) -> List[ManualItem]:
+        """Выдает все файлы очереди сразу - для массовой проверки"""
+        with self._lock:
+            items = [self._items.pop(path) for path in self._order]
+            self._order.clear()
+            self._prefetched.clear()
+        return items
+
+    def requeue(self, items: List[ManualItem]) -> None:
+        """Возвращает выданные, но не разрешенные файлы в начало очереди в прежнем порядке"""
+        with self._lock:
+            for item in reversed(items):
+                if item.path not in self._items:
+                    self._items[item.path] = item
+                    self._order.appendleft(item.path)
+        self._prefetch_upcoming()
+
+    def resolve(self, path: str) -> None:
+        """Удаляет разрешенный или пропущенный файл из постоянной очереди"""
+        with self._lock:
+            if self.run_key is None:
+                return
+            self._conn.execute("DELETE FROM manual_queue WHERE run_key = ? AND path = ?", (self.run_key, path))
+            self._conn.commit()
+
+    def upcoming(self, count: int) -> List[ManualItem]:
+        """Возвращает ближайшие count файлов очереди, не извлекая их"""
+        with self._lock:
+            return [self._items[path] for path in islice(self._order, count)]
+
+    def _prefetch_upcoming(self) -> None:
+        """Запускает подготовку ближайших файлов, которые еще не готовились"""
+        if not self.prefetch or not self.prefetch_count:
+            return
+        with self._lock:
+            items = []
+            for path in islice(self._order, self.prefetch_count):
+                if path not in self._prefetched:
+                    self._prefetched.add(path)
+                    items.append(self._items[path])
+        for item in items:
+            try:
+                self.prefetch(item)
+            except Exception as e:
+                logger.warning(f"Ошибка предзагрузки для {item.path}: {str(e)}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._order)
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            return path in self._items
+
+    def close(self) -> None:
+        """Закрывает соединение с базой"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,206 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from src.utils.settings import get_setting
+
+# Метаданные локального файла: название, исполнитель, длительность в секундах
+Metadata = Tuple[Optional[str], Optional[str], Optional[float]]
+
+# Нормализованные формы: слова названия, слова каждого исполнителя,
+# все слова исполнителей и длительность в секундах
+Forms = Tuple[FrozenSet[str], List[FrozenSet[str]], FrozenSet[str], Optional[float]]
+
+# Ключ, под которым нормализованные формы кэшируются в словаре трека Spotify
+MATCH_FORMS_KEY = '_match_forms'
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+# ISRC: код страны, код регистранта, год и номер записи (например, USUM71703861)
+_ISRC_PATTERN = re.compile(r'^[A-Z]{2}[A-Z0-9]{3}[0-9]{7}$')
+
+# Разделители нескольких исполнителей в одном теге
+_ARTIST_SEPARATOR = re.compile(r'\s*(?:[,;/&]|\bfeat\b\.?|\bft\b\.?|\bfeaturing\b|\bvs\b\.?)\s*')
+
+
+def normalize_isrc(value: Optional[str]) -> Optional[str]:
+    """Приводит ISRC к каноническому виду или возвращает None, если код некорректен"""
+    if not value:
+        return None
+    code = re.sub(r'[\s-]', '', str(value)).upper()
+    return code if _ISRC_PATTERN.match(code) else None
+
+
+def tokenize(text: Optional[str]) -> FrozenSet[str]:
+    """Разбивает строку на множество слов в нижнем регистре"""
+    if not text:
+        return frozenset()
+    return frozenset(_TOKEN_PATTERN.findall(text.casefold()))
+
+
+def split_artists(text: Optional[str]) -> List[FrozenSet[str]]:
+    """Разбивает тег исполнителя на отдельных исполнителей"""
+    if not text:
+        return []
+    parts = (tokenize(part) for part in _ARTIST_SEPARATOR.split(text.casefold()))
+    return [part for part in parts if part]
+
+
+def token_set_similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Схожесть двух множеств слов от 0 до 1
+
+    Полное вхождение одного множества в другое дает высокую оценку, а
+    коэффициент Дайса штрафует за лишние слова ("Radio Edit", "Live").
+    """
+    if not left or not right:
+        return 0.0
+    common = len(left & right)
+    containment = common / min(len(left), len(right))
+    dice = 2 * common / (len(left) + len(right))
+    return 0.6 * containment + 0.4 * dice
+
+
+@lru_cache(maxsize=4096)
+def query_forms(metadata: Metadata) -> Forms:
+    """Нормализованные формы метаданных локального файла"""
+    title, artist, duration = metadata
+    return tokenize(title), split_artists(artist), tokenize(artist), duration
+
+
+def candidate_forms(track: Dict[str, Any]) -> Forms:
+    """Нормализованные формы трека Spotify
+
+    Формы вычисляются один раз и сохраняются в самом словаре трека, поэтому
+    повторные оценки и перестроение диалога выбора их не пересчитывают.
+    """
+    forms = track.get(MATCH_FORMS_KEY)
+    if forms is None:
+        artists = [tokenize(a.get('name')) for a in track.get('artists') or []]
+        artists = [a for a in artists if a]
+        all_artists = frozenset().union(*artists) if artists else frozenset()
+        duration_ms = track.get('duration_ms')
+        duration = duration_ms / 1000 if duration_ms else None
+        forms = track[MATCH_FORMS_KEY] = (tokenize(track.get('name')), artists, all_artists, duration)
+    return forms
+
+
+def strip_match_forms(track: Dict[str, Any]) -> Dict[str, Any]:
+    """Возвращает копию трека без кэша форм - для сохранения в файлы и JSON"""
+    return {key: value for key, value in track.items() if key != MATCH_FORMS_KEY}
+
+
+class MatchResult(NamedTuple):
+    """Итоговая оценка и оценки отдельных составляющих от 0 до 1
+
+    duration равна None, если длительность неизвестна.
+    """
+    score: float
+    title: float
+    artist: float
+    duration: Optional[float]
+
+
+class MatchScorer:
+    """Оценка соответствия найденных в Spotify треков локальному файлу
+
+    Итоговая уверенность от 0 до 1 складывается из схожести названий по
+    множествам слов, совпадения исполнителей (с учетом нескольких исполнителей
+    у трека) и разницы длительностей. Если длительность неизвестна, ее вес
+    перераспределяется на остальные составляющие. Трек с оценкой не ниже
+    threshold принимается автоматически.
+    """
+
+    TITLE_WEIGHT = 0.5
+    ARTIST_WEIGHT = 0.3
+    DURATION_WEIGHT = 0.2
+
+    # Разница длительностей, при которой оценка еще полная и уже нулевая, в секундах
+    DURATION_TOLERANCE = 2.0
+    DURATION_LIMIT = 10.0
+
+    # Минимальная оценка названия или исполнителя, при которой поле считается совпавшим
+    FIELD_MATCH = 0.8
+
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = float(threshold if threshold is not None else get_setting('match_threshold'))
+
+    def _duration_score(self, original: float, found: float) -> float:
+        delta = abs(original - found)
+        if delta <= self.DURATION_TOLERANCE:
+            return 1.0
+        if delta >= self.DURATION_LIMIT:
+            return 0.0
+        return (self.DURATION_LIMIT - delta) / (self.DURATION_LIMIT - self.DURATION_TOLERANCE)
+
+    def _compare_forms(self, query: Forms, candidate: Forms) -> MatchResult:
+        title, artists, all_artists, duration = query
+        found_title, found_artists, found_all_artists, found_duration = candidate
+
+        title_score = token_set_similarity(title, found_title)
+
+        # Каждый исполнитель из тега сравнивается с лучшим из исполнителей трека;
+        # сравнение всех слов сразу покрывает теги, которые не удалось разделить
+        artist_score = 0.0
+        if artists and found_artists:
+            per_artist = sum(max(token_set_similarity(a, f) for f in found_artists) for a in artists) / len(artists)
+            artist_score = max(per_artist, token_set_similarity(all_artists, found_all_artists))
+
+        score = self.TITLE_WEIGHT * title_score + self.ARTIST_WEIGHT * artist_score
+        weight = self.TITLE_WEIGHT + self.ARTIST_WEIGHT
+        duration_score = None
+        if duration and found_duration:
+            duration_score = self._duration_score(duration, found_duration)
+            score += self.DURATION_WEIGHT * duration_score
+            weight += self.DURATION_WEIGHT
+        return MatchResult(score / weight, title_score, artist_score, duration_score)
+
+    def compare(self, metadata: Metadata, track: Dict) -> MatchResult:
+        """Сравнивает трек с метаданными файла по каждой составляющей"""
+        return self._compare_forms(query_forms(metadata), candidate_forms(track))
+
+    def score(self, metadata: Metadata, track: Dict) -> float:
+        """Оценивает соответствие одного трека метаданным файла"""
+        return self.compare(metadata, track).score
+
+    def score_batch(self, batch: Iterable[Tuple[Metadata, Sequence[Dict]]]) -> List[List[float]]:
+        """Оценивает всех кандидатов для пакета файлов за один вызов
+
+        Нормализованные формы каждого файла и каждого трека вычисляются один
+        раз и переиспользуются во всех последующих сравнениях.
+        """
+        results = []
+        for metadata, tracks in batch:
+            query = query_forms(metadata)
+            results.append([self._compare_forms(query, candidate_forms(track)).score for track in tracks])
+        return results
+
+    @staticmethod
+    def _pick_best(tracks: Sequence[Dict], scores: Sequence[float]) -> Tuple[Optional[Dict], float]:
+        if not tracks:
+            return None, 0.0
+        best = max(range(len(tracks)), key=scores.__getitem__)
+        return tracks[best], scores[best]
+
+    def best_match(self, metadata: Metadata, tracks: Sequence[Dict]) -> Tuple[Optional[Dict], float]:
+        """Возвращает лучший трек и его оценку или (None, 0.0), если кандидатов нет"""
+        query = query_forms(metadata)
+        scores = [self._compare_forms(query, candidate_forms(track)).score for track in tracks]
+        return self._pick_best(tracks, scores)
+
+    def best_matches(self, batch: Iterable[Tuple[Metadata, Sequence[Dict]]]) -> List[Tuple[Optional[Dict], float]]:
+        """Возвращает лучший трек и его оценку для каждого файла пакета"""
+        batch = list(batch)
+        return [self._pick_best(tracks, scores) for (_, tracks), scores in zip(batch, self.score_batch(batch))]
+
+    def is_field_match(self, score: Optional[float]) -> bool:
+        """Проверяет, совпадает ли отдельное поле (название или исполнитель)"""
+        return score is not None and score >= self.FIELD_MATCH
+
+    def is_duration_match(self, metadata: Metadata, track: Dict) -> bool:
+        """Проверяет, что длительности отличаются не больше допустимого"""
+        duration = metadata[2]
+        found_duration = candidate_forms(track)[3]
+        return bool(duration and found_duration) and abs(duration - found_duration) <= self.DURATION_TOLERANCE
+
+    def is_confident(self, score: float) -> bool:
+        """Проверяет, можно ли принять трек без ручного выбора"""
+        return score >= self.threshold
@@ -0,0 +1,117 @@
+import time
+import logging
+import threading
+from typing import Callable, Iterable, List, Optional, Set
+from src.utils.settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+class PlaylistWriter:
+    """Буферизованное добавление треков в плейлист пакетами
+
+    URI накапливаются и отправляются одним запросом, когда в буфере набирается
+    batch_size треков или с момента последней отправки прошло flush_interval
+    секунд. Порядок треков в плейлисте совпадает с порядком вызовов add.
+    Трек, уже добавленный или ожидающий отправки, повторно не добавляется;
+    добавленным трек считается только после успешной отправки.
+    Методы можно вызывать из разных потоков. После каждой успешной отправки
+    вызывается on_flush(uris, затраченное время в секундах). Треки из existing
+    считаются уже добавленными - так продолжается прерванный запуск. Если
+    отправка не удалась, треки остаются в буфере и отправляются следующей
+    попыткой; до успешной отправки пакет по порогу batch_size не повторяется
+    на каждом add, а ждет flush_interval.
+    """
+
+    # Максимальное число треков в одном запросе к API
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, spotify_client, playlist_id: str, batch_size: int = MAX_BATCH_SIZE,
+                 flush_interval: Optional[float] = None,
+                 on_flush: Optional[Callable[[List[str], float], None]] = None,
+                 existing: Optional[Iterable[str]] = None):
+        self.spotify_client = spotify_client
+        self.playlist_id = playlist_id
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+        self.flush_interval = float(flush_interval if flush_interval is not None
+                                    else get_setting('playlist_flush_interval'))
+        self.on_flush = on_flush
+        self.buffer: List[str] = []
+        self.added_count = 0
+        self.duplicate_count = 0
+        self.last_error: Optional[Exception] = None
+        self._seen: Set[str] = set(existing or ())
+        self._queued: Set[str] = set()
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+
+    def __contains__(self, uri: str) -> bool:
+        """Проверяет, был ли трек уже добавлен в плейлист или ждет отправки"""
+        with self._lock:
+            return uri in self._seen or uri in self._queued
+
+    @property
+    def pending(self) -> int:
+        """Количество треков, ожидающих отправки"""
+        return len(self.buffer)
+
+    def add(self, uri: str) -> bool:
+        """Добавляет трек в буфер и отправляет пакет при достижении порога
+
+        Возвращает False, если трек уже был добавлен в плейлист или ждет
+        отправки; ждущий трек уйдет со следующей отправкой буфера.
+        """
+        with self._lock:
+            if uri in self._seen or uri in self._queued:
+                self.duplicate_count += 1
+                return False
+            self._queued.add(uri)
+            self.buffer.append(uri)
+            if len(self.buffer) >= self.batch_size and self.last_error is None:
+                self.flush()
+            else:
+                self.tick()
+            return True
+
+    def tick(self) -> None:
+        """Отправляет буфер, если с последней отправки прошло flush_interval секунд"""
+        with self._lock:
+            if self.buffer and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self) -> None:
+        """Отправляет все накопленные треки в плейлист"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self.buffer:
+                return
+
+            # После неудачной отправки в буфере может быть больше одного пакета
+            while self.buffer:
+                uris = self.buffer[:self.batch_size]
+                logger.debug(f"Добавление {len(uris)} треков в плейлист {self.playlist_id}")
+                started = time.perf_counter()
+                try:
+                    self.spotify_client.add_tracks_to_playlist(self.playlist_id, uris)
+                except Exception as e:
+                    # Треки удаляются из буфера только после успешной отправки
+                    self.last_error = e
+                    raise
+                del self.buffer[:len(uris)]
+                self._queued.difference_update(uris)
+                self._seen.update(uris)
+                self.last_error = None
+                self.added_count += len(uris)
+                if self.on_flush:
+                    self.on_flush(uris, time.perf_counter() - started)
+
+    def drop_pending(self) -> List[str]:
+        """Отказывается от неотправленных треков и возвращает их URI"""
+        with self._lock:
+            uris, self.buffer = self.buffer, []
+            # Треки не считаются добавленными, их можно поставить в плейлист снова
+            self._queued.clear()
+            return uris
+
+    def close(self) -> None:
+        """Отправляет оставшиеся треки перед завершением работы"""
+        self.flush()
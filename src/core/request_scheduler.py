@@ -0,0 +1,164 @@
+import time
+import random
+import threading
+import logging
+from typing import Callable, Optional
+import requests
+from src.utils.settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+class RequestCancelled(Exception):
+    """Запрос не отправлен: операция отменена во время ожидания"""
+
+class RequestScheduler:
+    """Планировщик запросов к API Spotify
+
+    Ограничивает частоту запросов алгоритмом token bucket, при ответе 429
+    приостанавливает все потоки на время из заголовка Retry-After и повторяет
+    запросы с экспоненциальной задержкой и джиттером при ошибках 5xx и сбоях сети.
+    Частота подстраивается под лимит: после 429 она уменьшается вдвое, а после
+    успешных ответов постепенно растет до заданного максимума.
+
+    Если Retry-After больше max_retry_after, ответ 429 сразу возвращается
+    вызывающему коду. Все ожидания прерываются вызовом cancel(): ожидающие
+    запросы завершаются исключением RequestCancelled до вызова reset().
+    """
+
+    RETRY_STATUSES = {500, 502, 503, 504}
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None,
+                 max_retries: Optional[int] = None, backoff_base: float = 0.5, max_backoff: float = 30.0,
+                 max_retry_after: Optional[float] = None):
+        self.max_rate = float(rate or get_setting('api_rate_limit'))
+        self.min_rate = min(1.0, self.max_rate)
+        self.rate = self.max_rate
+        self.burst = max(1, int(burst or get_setting('api_burst')))
+        self.max_retries = int(max_retries if max_retries is not None else get_setting('api_max_retries'))
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.max_retry_after = float(max_retry_after if max_retry_after is not None
+                                     else get_setting('api_max_retry_after'))
+
+        self.throttled_count = 0
+        self.retry_count = 0
+
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Прерывает все текущие и будущие ожидания до вызова reset"""
+        self._cancelled.set()
+
+    def reset(self) -> None:
+        """Снимает отмену перед новой операцией"""
+        self._cancelled.clear()
+
+    def _wait(self, seconds: float) -> None:
+        """Ждет seconds секунд; при отмене выбрасывает RequestCancelled"""
+        if self._cancelled.wait(seconds):
+            raise RequestCancelled("Запрос к Spotify отменен")
+
+    def _refill(self, now: float) -> None:
+        """Пополняет корзину токенов с учетом прошедшего времени"""
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self) -> None:
+        """Ожидает разрешения на отправку очередного запроса"""
+        while True:
+            if self._cancelled.is_set():
+                raise RequestCancelled("Запрос к Spotify отменен")
+            with self._lock:
+                now = time.monotonic()
+                if self._paused_until > now:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            self._wait(wait)
+
+    def available_capacity(self) -> int:
+        """Возвращает число запросов, которые можно отправить без ожидания"""
+        with self._lock:
+            now = time.monotonic()
+            if self._paused_until > now:
+                return 0
+            self._refill(now)
+            return int(self._tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Приостанавливает отправку запросов всеми потоками"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def _on_rate_limited(self, retry_after: float) -> None:
+        """Обрабатывает ответ 429: пауза и снижение частоты"""
+        self.pause(retry_after)
+        with self._lock:
+            self.throttled_count += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+        logger.warning(f"Превышен лимит запросов Spotify, пауза {retry_after:.1f} с, частота {self.rate:.1f} запр./с")
+
+    def _on_success(self) -> None:
+        """Постепенно возвращает частоту запросов к максимальной"""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + 0.1)
+
+    def _backoff(self, attempt: int) -> float:
+        """Возвращает задержку перед повтором с полным джиттером"""
+        return random.uniform(0, min(self.max_backoff, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float:
+        """Извлекает задержку из заголовка Retry-After"""
+        try:
+            return max(0.0, float(response.headers.get('Retry-After', 1)))
+        except (TypeError, ValueError):
+            return 1.0
+
+    def execute(self, send: Callable[[], requests.Response]) -> requests.Response:
+        """Отправляет запрос с учетом лимитов и повторяет его при временных ошибках"""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                self.retry_count += 1
+                self._wait(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 429 and attempt < self.max_retries:
+                retry_after = self._retry_after(response)
+                if retry_after > self.max_retry_after:
+                    # Такую паузу нельзя пережидать: ошибка возвращается вызывающему коду
+                    with self._lock:
+                        self.throttled_count += 1
+                    logger.warning(f"Превышен лимит запросов Spotify, Retry-After {retry_after:.0f} с больше допустимого")
+                    return response
+                self._on_rate_limited(retry_after)
+                self.retry_count += 1
+                attempt += 1
+                continue
+
+            if response.status_code in self.RETRY_STATUSES and attempt < self.max_retries:
+                self.retry_count += 1
+                self._wait(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code < 400:
+                self._on_success()
+            return response
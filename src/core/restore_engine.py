@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+from src.core.backup_format import iter_snapshot_tracks
+from src.utils.concurrency import ordered_map
+from src.utils.settings import CONFIG_DIR, get_setting
+
+logger = logging.getLogger(__name__)
+
+class RestoreEngine:
+    """Восстановление любимых треков из бэкапа
+
+    Треки отправляются порциями по 50 ID в несколько параллельных запросов.
+    После каждой порции обновляется файл контрольной точки, поэтому прерванное
+    восстановление продолжается с места остановки. После успешного завершения
+    контрольная точка удаляется.
+
+    В режиме skip_liked перед отправкой каждой порции проверяется, какие треки
+    уже есть в любимых, и отправляются только недостающие.
+    """
+
+    CHUNK_SIZE = 50
+
+    def __init__(self, spotify_client, backup_file: str, max_workers: Optional[int] = None,
+                 checkpoint_dir: Optional[str] = None, skip_liked: bool = False):
+        self.spotify_client = spotify_client
+        self.backup_file = backup_file
+        self.max_workers = max(1, int(max_workers or get_setting('restore_workers')))
+        self.checkpoint_dir = checkpoint_dir or os.path.join(CONFIG_DIR, 'restore_checkpoints')
+        self.checkpoint_path = os.path.join(self.checkpoint_dir, f"{self._backup_key()}.json")
+        self.completed_chunks: Set[int] = set()
+        self.completed = False
+        self.skip_liked = skip_liked
+        self.skipped_count = 0
+
+    def _backup_key(self) -> str:
+        """Вычисляет ключ контрольной точки по пути, размеру и времени изменения бэкапа"""
+        path = os.path.abspath(self.backup_file)
+        stat = os.stat(path)
+        return hashlib.sha1(f"{path}|{stat.st_size}|{stat.st_mtime}".encode('utf-8')).hexdigest()
+
+    def _load_checkpoint(self) -> None:
+        """Загружает номера уже отправленных порций"""
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.completed_chunks = set(json.load(f).get('completed_chunks', []))
+            if self.completed_chunks:
+                logger.info(f"Продолжение восстановления: уже отправлено порций {len(self.completed_chunks)}")
+        except (OSError, ValueError):
+            self.completed_chunks = set()
+
+    def _save_checkpoint(self) -> None:
+        """Атомарно сохраняет контрольную точку"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'backup_file': os.path.abspath(self.backup_file),
+                'completed_chunks': sorted(self.completed_chunks)
+            }, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _remove_checkpoint(self) -> None:
+        try:
+            os.remove(self.checkpoint_path)
+        except OSError:
+            pass
+
+    def _iter_chunks(self) -> Iterator[Tuple[int, List[str]]]:
+        """Лениво делит ID треков из бэкапа (вместе с его базовыми бэкапами) на порции"""
+        chunk: List[str] = []
+        index = 0
+        for track in iter_snapshot_tracks(self.backup_file):
+            if 'spotify_uri' not in track:
+                continue
+            chunk.append(track['spotify_uri'].split(':')[-1])
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield index, chunk
+                index += 1
+                chunk = []
+        if chunk:
+            yield index, chunk
+
+    def _plan(self) -> Tuple[int, int, List[Tuple[int, List[str]]]]:
+        """За один проход по бэкапу считает общее и уже восстановленное число треков и собирает оставшиеся порции"""
+        total = done = 0
+        pending: List[Tuple[int, List[str]]] = []
+        for index, track_ids in self._iter_chunks():
+            total += len(track_ids)
+            # Порции из контрольной точки считаются уже восстановленными
+            if index in self.completed_chunks:
+                done += len(track_ids)
+            else:
+                pending.append((index, track_ids))
+        return total, done, pending
+
+    def _send_chunk(self, chunk: Tuple[int, List[str]]) -> Tuple[int, int]:
+        """Добавляет порцию треков в любимые, возвращает число обработанных и пропущенных треков"""
+        _, track_ids = chunk
+        missing_ids = track_ids
+        if self.skip_liked:
+            liked = self.spotify_client.check_liked_tracks(track_ids)
+            missing_ids = [track_id for track_id, is_liked in zip(track_ids, liked) if not is_liked]
+        if missing_ids:
+            self.spotify_client.add_to_liked_tracks(missing_ids)
+        return len(track_ids), len(track_ids) - len(missing_ids)
+
+    def run(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+            is_running: Optional[Callable[[], bool]] = None) -> Tuple[int, str]:
+        """Выполняет восстановление
+
+        Args:
+            progress_callback: Вызывается после каждой порции с числом обработанных и общим числом треков
+            is_running: Возвращает False, если восстановление нужно прервать
+
+        Returns:
+            Tuple[int, str]: Количество восстановленных треков и сообщение о результате
+        """
+        self._load_checkpoint()
+        total, done, pending = self._plan()
+        if not total:
+            return 0, "Не найдено действительных ID треков"
+
+        restored = done
+        if progress_callback:
+            progress_callback(done, total)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="restore")
+        try:
+            for (index, track_ids), future in ordered_map(executor, self._send_chunk, pending,
+                                                          self.max_workers, is_running):
+                try:
+                    processed, skipped = future.result()
+                    restored += processed
+                    self.skipped_count += skipped
+                except Exception as e:
+                    logger.error(f"Ошибка восстановления порции {index}: {str(e)}")
+                    return restored, f"Ошибка при восстановлении: {str(e)}. Повторите запуск, чтобы продолжить"
+
+                self.completed_chunks.add(index)
+                self._save_checkpoint()
+                if progress_callback:
+                    progress_callback(restored, total)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if restored < total:
+            return restored, "Восстановление прервано, при следующем запуске оно продолжится"
+
+        self._remove_checkpoint()
+        self.completed = True
+        if self.skip_liked:
+            logger.info(f"Пропущено треков, уже находящихся в любимых: {self.skipped_count}")
+            return restored, f"Треки успешно восстановлены, пропущено уже добавленных: {self.skipped_count}"
+        return restored, "Треки успешно восстановлены"
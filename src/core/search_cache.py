@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+from src.core.matcher import strip_match_forms
+from src.utils.settings import CONFIG_DIR, get_setting
+
+logger = logging.getLogger(__name__)
+
+class SearchCache:
+    """Постоянный кэш результатов поиска Spotify на основе SQLite
+
+    Ключ записи - нормализованный запрос и рынок; вместе с результатом хранится
+    лимит, с которым он получен. Запись подходит для запроса с тем же или
+    меньшим лимитом, а также для любого лимита, если Spotify вернул меньше
+    треков, чем запрашивалось. Записи устаревают через ttl секунд, а при
+    превышении max_entries удаляются давно не использованные.
+    """
+
+    # Как часто (в числе записей) проверять размер кэша
+    EVICTION_CHECK_INTERVAL = 100
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.db_path = db_path or os.path.join(CONFIG_DIR, 'search_cache.db')
+        self.ttl = float(ttl if ttl is not None else get_setting('search_cache_ttl'))
+        self.max_entries = int(max_entries if max_entries is not None else get_setting('search_cache_max_entries'))
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS search_cache (
+                query TEXT NOT NULL,
+                market TEXT NOT NULL,
+                results TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                result_limit INTEGER NOT NULL DEFAULT 5,
+                PRIMARY KEY (query, market)
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(search_cache)")}
+        if 'result_limit' not in columns:
+            # Кэш предыдущих версий заполнялся запросами с лимитом 5
+            self._conn.execute("ALTER TABLE search_cache ADD COLUMN result_limit INTEGER NOT NULL DEFAULT 5")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Приводит запрос к каноническому виду для использования в качестве ключа"""
+        return re.sub(r'\s+', ' ', query or '').strip().lower()
+
+    def get(self, query: str, market: str, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Возвращает закэшированные треки или None, если записи нет, она устарела или получена с меньшим лимитом"""
+        key = self.normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created_at, result_limit FROM search_cache WHERE query = ? AND market = ?",
+                (key, market)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM search_cache WHERE query = ? AND market = ?", (key, market))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            tracks = json.loads(row[0])
+            if limit is not None and limit > row[2] and len(tracks) >= row[2]:
+                # Запись получена с меньшим лимитом, и треков могло быть больше
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE search_cache SET accessed_at = ? WHERE query = ? AND market = ?",
+                (now, key, market)
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return tracks[:limit] if limit is not None else tracks
+
+    def set(self, query: str, market: str, tracks: List[Dict[str, Any]], limit: Optional[int] = None) -> None:
+        """Сохраняет результат поиска (пустой список означает, что треков не найдено)"""
+        key = self.normalize_query(query)
+        now = time.time()
+        result_limit = limit if limit is not None else len(tracks)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (query, market, results, created_at, accessed_at, result_limit) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, market, json.dumps([strip_match_forms(track) for track in tracks], ensure_ascii=False),
+                 now, now, result_limit)
+            )
+            self._writes += 1
+            if self._writes % self.EVICTION_CHECK_INTERVAL == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Удаляет устаревшие записи и самые старые записи сверх лимита"""
+        self._conn.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE rowid IN ("
+                "SELECT rowid FROM search_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            logger.debug(f"Из кэша поиска удалено {count - self.max_entries} записей")
+
+    def clear(self) -> None:
+        """Очищает кэш и сбрасывает счетчики"""
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику попаданий в кэш"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': entries,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }
+
+    def close(self) -> None:
+        """Закрывает соединение с базой"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,277 @@
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from src.core.matcher import Metadata, MatchScorer
+from src.utils.concurrency import ordered_map
+from src.utils.settings import get_setting
+
+# Пометки версий в скобках или после дефиса: (Radio Edit), [Remastered 2011], - Extended Mix
+_VERSION_WORDS = r'(?:remix|mix|edit|version|remaster(?:ed)?|live|radio|extended|original|acoustic|instrumental|mono|stereo)'
+_VERSION_PATTERN = re.compile(
+    r'\s*[(\[][^)\]]*\b' + _VERSION_WORDS + r'\b[^)\]]*[)\]]'
+    r'|\s+-\s+[^-]*\b' + _VERSION_WORDS + r'\b.*$',
+    re.IGNORECASE
+)
+# Приглашенные исполнители: feat. X, (ft. X), [featuring X]
+_FEATURING_PATTERN = re.compile(r'\s*[(\[]?\b(?:feat|ft|featuring)\b\.?.*$', re.IGNORECASE)
+_ARTIST_SEPARATOR = re.compile(r'\s*(?:[,;&/]|\bvs\b\.?)\s*', re.IGNORECASE)
+_WORD_PATTERN = re.compile(r'\w+')
+
+def strip_title(title: str) -> str:
+    """Удаляет из названия пометки ремиксов, версий и приглашенных исполнителей"""
+    stripped = _FEATURING_PATTERN.sub('', _VERSION_PATTERN.sub('', title)).strip()
+    return stripped or title
+
+def primary_artist(artist: str) -> str:
+    """Возвращает основного исполнителя из тега с несколькими исполнителями"""
+    main = _ARTIST_SEPARATOR.split(_FEATURING_PATTERN.sub('', artist))[0].strip()
+    return main or artist
+
+def build_query_cascade(title: str, artist: str) -> List[Tuple[str, str]]:
+    """Строит последовательность запросов (этап, запрос) от самого точного к самому широкому
+
+    Сначала запрос с полями track: и artist:, затем название без пометок
+    ремиксов и feat с основным исполнителем, затем только название.
+    Повторяющиеся запросы пропускаются.
+    """
+    def field(value: str) -> str:
+        return value.replace('"', ' ').strip()
+
+    clean_title = strip_title(title)
+    main_artist = primary_artist(artist)
+    stages = [
+        ('fielded', f'track:"{field(title)}" artist:"{field(main_artist)}"'),
+        ('stripped', f'{clean_title} {main_artist}'),
+        ('title', clean_title),
+    ]
+    cascade, seen = [], set()
+    for stage, query in stages:
+        key = query.casefold()
+        if key not in seen:
+            seen.add(key)
+            cascade.append((stage, query))
+    return cascade
+
+class SearchRequest(NamedTuple):
+    """Что искать для одного файла: текстовый запрос, ISRC и метаданные для каскада запросов"""
+    query: Optional[str]
+    isrc: Optional[str] = None
+    metadata: Optional[Metadata] = None
+
+class SearchResult(NamedTuple):
+    """Результат поиска: треки, статус SpotifyClient и стратегия, давшая результат
+
+    strategy равна 'isrc' для точного совпадения по ISRC, названию этапа
+    каскада ('fielded', 'stripped', 'title') или 'widened' для расширенного
+    поиска, на котором найден уверенный кандидат, 'cascade', если уверенного кандидата не нашел ни один этап
+    (tracks тогда содержит кандидатов всех этапов), и 'text' для одиночного
+    текстового запроса. elapsed_ms - сколько задание ждало результата.
+    """
+    tracks: Optional[List[Dict[str, Any]]]
+    status: str
+    strategy: str
+    elapsed_ms: Optional[float] = None
+
+class SearchPipeline:
+    """Параллельный поиск треков в Spotify с ограниченным числом запросов в полете
+
+    Задания подаются как пары (payload, SearchRequest). Сначала выполняется поиск
+    по ISRC, а текстовый поиск - только если ISRC не указан или не дал
+    результата. Если в задании есть метаданные, текстовый поиск идет каскадом
+    запросов и останавливается на первом этапе с уверенным кандидатом; при
+    свободной пропускной способности API этапы отправляются одновременно.
+    Если уверенного кандидата нет ни на одном этапе, поиск повторяется с
+    увеличенным лимитом и на запасных рынках.
+    Одинаковые по нормализованным названию и исполнителю (и ISRC) задания
+    одного запуска разделяют один запрос и один результат.
+    Результаты возвращаются в порядке подачи в виде
+    (payload, future), где future.result() равен SearchResult или None, если
+    искать нечего.
+    """
+
+    def __init__(self, spotify_client, max_in_flight: Optional[int] = None,
+                 matcher: Optional[MatchScorer] = None, market: Optional[str] = None,
+                 limit: Optional[int] = None):
+        self.spotify_client = spotify_client
+        self.max_in_flight = max(1, int(max_in_flight or get_setting('search_workers')))
+        self.matcher = matcher or MatchScorer()
+        self.market = market or get_setting('search_market')
+        self.limit = int(limit or get_setting('search_limit'))
+        self.wide_limit = max(self.limit, int(get_setting('search_wide_limit')))
+        self.fallback_markets = [m for m in get_setting('search_fallback_markets') or [] if m != self.market]
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self._stage_executor: Optional[ThreadPoolExecutor] = None
+        # Поиски текущего запуска по ключу запроса: одинаковые файлы разделяют один результат
+        self._shared: Dict[Tuple, Future] = {}
+        self._shared_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _request_key(request: SearchRequest) -> Tuple:
+        """Ключ объединения поисков: ISRC и нормализованные название и исполнитель"""
+        def normalize(text: Optional[str]) -> str:
+            return ' '.join(_WORD_PATTERN.findall(text.casefold())) if text else ''
+
+        if request.metadata:
+            title, artist = request.metadata[0], request.metadata[1]
+            return request.isrc or '', normalize(title), normalize(artist)
+        return request.isrc or '', normalize(request.query)
+
+    def _search(self, job: Tuple[Any, Optional[SearchRequest]]) -> Optional[SearchResult]:
+        """Выполняет поиск для одного задания, объединяя его с таким же поиском этого запуска"""
+        _, request = job
+        if not request:
+            return None
+
+        started = time.perf_counter()
+        key = self._request_key(request)
+        with self._shared_lock:
+            shared = self._shared.get(key)
+            owner = shared is None
+            if owner:
+                shared = self._shared[key] = Future()
+        if not owner:
+            # Такой же поиск уже выполняется или выполнен: ждем его результата
+            self._count('coalesced')
+            result = shared.result()
+        else:
+            try:
+                result = self._execute(request)
+            except BaseException as e:
+                shared.set_exception(e)
+                raise
+            shared.set_result(result)
+        if result is None:
+            return None
+        return result._replace(elapsed_ms=round((time.perf_counter() - started) * 1000, 2))
+
+    def _execute(self, request: SearchRequest) -> Optional[SearchResult]:
+        """Выполняет поиск по ISRC, каскаду запросов или одиночному запросу"""
+
+        if request.isrc:
+            self._count('isrc_requests')
+            tracks, status = self.spotify_client.search_by_isrc(request.isrc, self.market)
+            if tracks:
+                self._count('isrc_hits')
+                return SearchResult(tracks, status, 'isrc')
+            if not request.query:
+                return SearchResult(tracks, status, 'isrc')
+
+        metadata = request.metadata
+        if metadata and metadata[0] and metadata[1]:
+            return self._search_cascade(metadata)
+
+        if not request.query:
+            return None
+        self._count('text_requests')
+        tracks, status = self.spotify_client.search_track(request.query, self.market, self.limit)
+        if tracks:
+            self._count('text_hits')
+        return SearchResult(tracks, status, 'text')
+
+    def _has_spare_capacity(self, stages: int) -> bool:
+        """Проверяет, хватит ли свободных запросов на все этапы сверх нужд остальных потоков"""
+        scheduler = getattr(self.spotify_client, 'scheduler', None)
+        if scheduler is None:
+            return False
+        return scheduler.available_capacity() - self.max_in_flight >= stages - 1
+
+    def _search_cascade(self, metadata: Metadata) -> SearchResult:
+        """Ищет трек каскадом запросов до первого уверенного кандидата"""
+        stages = build_query_cascade(metadata[0], metadata[1])
+        futures: List[Future] = []
+        stage_executor = self._stage_executor
+        if stage_executor is not None and len(stages) > 1 and self._has_spare_capacity(len(stages)):
+            try:
+                futures = [stage_executor.submit(self._search_stage, stage, query) for stage, query in stages]
+            except RuntimeError:
+                # Пул уже остановлен: обработка завершается, этапы выполняются по очереди
+                futures = []
+
+        candidates: Dict[str, Dict[str, Any]] = {}
+        status = "Треки не найдены"
+        widen_query = None
+        try:
+            for index, (stage, query) in enumerate(stages):
+                if futures:
+                    tracks, status = futures[index].result()
+                else:
+                    tracks, status = self._search_stage(stage, query)
+                if not tracks:
+                    continue
+                widen_query = widen_query or query
+                _, score = self.matcher.best_match(metadata, tracks)
+                if self.matcher.is_confident(score):
+                    self._count(f'{stage}_hits')
+                    return SearchResult(tracks, status, stage)
+                for track in tracks:
+                    candidates.setdefault(track.get('uri') or str(id(track)), track)
+        finally:
+            for future in futures:
+                future.cancel()
+
+        # Расширяем поиск только при отсутствии уверенного кандидата: больше
+        # результатов по первому давшему треки запросу, затем другие рынки
+        widen_query = widen_query or stages[0][1]
+        for market, limit in self._widening_steps():
+            self._count('widened_requests')
+            tracks, widened_status = self.spotify_client.search_track(widen_query, market, limit)
+            if not tracks:
+                continue
+            status = widened_status
+            _, score = self.matcher.best_match(metadata, tracks)
+            if self.matcher.is_confident(score):
+                self._count('widened_hits')
+                return SearchResult(tracks, status, 'widened')
+            for track in tracks:
+                candidates.setdefault(track.get('uri') or str(id(track)), track)
+
+        # Уверенного кандидата нет: для ручного выбора отдаем кандидатов всех этапов
+        if candidates:
+            return SearchResult(list(candidates.values()), "OK", 'cascade')
+        return SearchResult(None, status, 'cascade')
+
+    def _search_stage(self, stage: str, query: str) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+        """Выполняет запрос этапа каскада
+
+        Запрос учитывается в момент отправки: этапы, запущенные заранее, попадают
+        в статистику, даже если их результат не понадобился.
+        """
+        self._count(f'{stage}_requests')
+        return self.spotify_client.search_track(query, self.market, self.limit)
+
+    def _widening_steps(self) -> List[Tuple[str, int]]:
+        """Повторные запросы (рынок, лимит) для расширенного поиска"""
+        steps = []
+        if self.wide_limit > self.limit:
+            steps.append((self.market, self.wide_limit))
+        steps.extend((market, self.limit) for market in self.fallback_markets)
+        return steps
+
+    def run(self, jobs: Iterable[Tuple[Any, Optional[SearchRequest]]],
+            is_running: Callable[[], bool]) -> Iterator[Tuple[Any, Future]]:
+        """Запускает поиск по заданиям и выдает результаты в исходном порядке"""
+        with self._shared_lock:
+            self._shared.clear()
+        executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="spotify-search")
+        # Отдельный пул для одновременных этапов каскада, чтобы задания не ждали сами себя
+        self._stage_executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="spotify-stage")
+        try:
+            for (payload, _), future in ordered_map(executor, self._search, jobs, self.max_in_flight, is_running):
+                yield payload, future
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._stage_executor.shutdown(wait=False, cancel_futures=True)
+            self._stage_executor = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает число запросов и результативных запросов по стратегиям и этапам поиска"""
+        with self._stats_lock:
+            return dict(self.stats)
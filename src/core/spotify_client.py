@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import base64
 import urllib.parse
@@ -13,6 +14,14 @@ import urllib.parse
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from threading import Thread
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from src.core.search_cache import SearchCache
+from src.core.matcher import normalize_isrc
+from src.core.restore_engine import RestoreEngine
+from src.core.request_scheduler import RequestScheduler
+from src.utils.concurrency import ordered_map
+from src.utils.settings import get_setting
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -204,6 +213,9 @@ class OAuthHandler(http.server.SimpleHTTPRequestHandler):
             self.wfile.write(error_html.encode('utf-8'))
 
 class SpotifyClient:
+    # Максимальный лимит результатов поиска в API Spotify
+    MAX_SEARCH_LIMIT = 50
+    
     def __init__(self, client_id=None, client_secret=None):
         self.client_id = client_id
         self.client_secret = client_secret
@@ -211,6 +223,23 @@ class SpotifyClient:
         self.token_expires_at = 0
         self.user_token = None
         self.user_token_expires_at = 0
+        self.market = get_setting('search_market')
+        self.search_limit = int(get_setting('search_limit'))
+        
+        # Общий пул HTTP-соединений для всех запросов к API
+        self.session = self._create_session(get_setting('http_pool_size'))
+        self.scheduler = RequestScheduler()
+        self.latency_stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        self._token_lock = threading.Lock()
+        self._user_token_lock = threading.Lock()
+        
+        # Постоянный кэш результатов поиска
+        try:
+            self.search_cache = SearchCache()
+        except Exception as e:
+            logger.warning(f"Кэш поиска недоступен: {str(e)}")
+            self.search_cache = None
         
         logger.info("Инициализация SpotifyClient")
         # Пытаемся загрузить сохраненные учетные данные
@@ -219,6 +248,56 @@ class SpotifyClient:
         if self.client_id and self.client_secret:
             self.initialize_client()
     
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """Создает HTTP-сессию с пулом постоянных соединений"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.headers.update({"Connection": "keep-alive"})
+        return session
+    
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Выполняет HTTP-запрос через планировщик и общий пул соединений, учитывая время ответа"""
+        kwargs.setdefault('timeout', 10)
+        endpoint = self._endpoint_name(method, url)
+        
+        def send() -> requests.Response:
+            start = time.perf_counter()
+            try:
+                return self.session.request(method, url, **kwargs)
+            finally:
+                self._record_latency(endpoint, time.perf_counter() - start)
+        
+        return self.scheduler.execute(send)
+    
+    @staticmethod
+    def _endpoint_name(method: str, url: str) -> str:
+        """Возвращает имя эндпоинта без идентификаторов для группировки статистики"""
+        path = urllib.parse.urlparse(url).path
+        path = re.sub(r'^(/v1/(?:tracks|users|playlists))/[^/]+', r'\1/{id}', path)
+        return f"{method} {path}"
+    
+    def _record_latency(self, endpoint: str, elapsed: float) -> None:
+        """Добавляет время ответа в статистику эндпоинта"""
+        with self._stats_lock:
+            stats = self.latency_stats.setdefault(endpoint, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+    
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает статистику времени ответа по эндпоинтам (в миллисекундах)"""
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    'count': stats['count'],
+                    'avg_ms': stats['total'] / stats['count'] * 1000,
+                    'max_ms': stats['max'] * 1000
+                }
+                for endpoint, stats in self.latency_stats.items()
+            }
+    
     def load_credentials(self):
         """Загружает сохраненные учетные данные"""
         try:
@@ -275,8 +354,17 @@ class SpotifyClient:
         if self.access_token and time.time() < self.token_expires_at - 60:
             return self.access_token
             
+        with self._token_lock:
+            # Токен мог обновить другой поток, пока мы ждали блокировку
+            if self.access_token and time.time() < self.token_expires_at - 60:
+                return self.access_token
+            return self._fetch_token()
+        
+    def _fetch_token(self) -> str:
+        """Запрашивает новый токен доступа по client credentials"""
         try:
-            auth_response = requests.post(
+            auth_response = self._request(
+                "POST",
                 "https://accounts.spotify.com/api/token",
                 data={'grant_type': 'client_credentials'},
                 auth=(self.client_id, self.client_secret),
@@ -302,7 +390,10 @@ class SpotifyClient:
         if self.user_token and time.time() < self.user_token_expires_at - 60:
             return self.user_token
             
-        return self._fetch_user_token()
+        with self._user_token_lock:
+            if self.user_token and time.time() < self.user_token_expires_at - 60:
+                return self.user_token
+            return self._fetch_user_token()
         
     def _start_auth_server(self) -> Tuple[socketserver.TCPServer, Thread]:
         """Запускает локальный сервер для получения кода авторизации"""
@@ -361,7 +452,7 @@ class SpotifyClient:
                 "redirect_uri": redirect_uri
             }
             
-            response = requests.post(token_url, headers=headers, data=data)
+            response = self._request("POST", token_url, headers=headers, data=data)
             if response.status_code != 200:
                 raise Exception(f"Ошибка получения пользовательского токена: {response.text}")
             
@@ -384,7 +475,8 @@ class SpotifyClient:
         }
         
         # Получаем ID пользователя
-        user_response = requests.get(
+        user_response = self._request(
+            "GET",
             "https://api.spotify.com/v1/me",
             headers=headers
         )
@@ -400,7 +492,8 @@ class SpotifyClient:
             "public": False
         }
         
-        playlist_response = requests.post(
+        playlist_response = self._request(
+            "POST",
             f"https://api.spotify.com/v1/users/{user_id}/playlists",
             headers=headers,
             json=playlist_data
@@ -422,7 +515,8 @@ class SpotifyClient:
         # Добавляем треки порциями по 100 штук
         for i in range(0, len(track_uris), 100):
             chunk = track_uris[i:i + 100]
-            response = requests.post(
+            response = self._request(
+                "POST",
                 f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks",
                 headers=headers,
                 json={"uris": chunk}
@@ -430,19 +524,30 @@ class SpotifyClient:
             if response.status_code != 201:
                 raise Exception(f"Ошибка добавления треков в плейлист: {response.text}")
                 
-    def search_track(self, query: str) -> Tuple[Optional[Dict[str, Any]], str]:
-        """Поиск трека в Spotify"""
+    def search_track(self, query: str, market: Optional[str] = None,
+                     limit: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Поиск трека в Spotify; по умолчанию используются рынок и лимит из настроек"""
+        market = market or self.market
+        limit = max(1, min(int(limit or self.search_limit), self.MAX_SEARCH_LIMIT))
+        if self.search_cache:
+            cached = self.search_cache.get(query, market, limit)
+            if cached is not None:
+                if not cached:
+                    return None, "Треки не найдены"
+                return cached, "OK"
+        
         token = self.get_token()
         headers = {"Authorization": f"Bearer {token}"}
         params = {
             "q": query,
             "type": "track",
-            "limit": 5,
-            "market": "TR"
+            "limit": limit,
+            "market": market
         }
         
         try:
-            response = requests.get(
+            response = self._request(
+                "GET",
                 "https://api.spotify.com/v1/search",
                 headers=headers,
                 params=params,
@@ -451,18 +556,45 @@ class SpotifyClient:
             response.raise_for_status()
             
             results = response.json()
-            if not results.get("tracks") or not results["tracks"]["items"]:
+            items = (results.get("tracks") or {}).get("items") or []
+            if self.search_cache:
+                self.search_cache.set(query, market, items, limit)
+                
+            if not items:
                 return None, "Треки не найдены"
                 
-            return results["tracks"]["items"], "OK"
+            return items, "OK"
             
         except requests.exceptions.RequestException as e:
             return None, f"Ошибка запроса: {str(e)}"
             
+    def search_by_isrc(self, isrc: str, market: Optional[str] = None) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+        """Поиск трека в Spotify по ISRC; результат кэшируется по коду ISRC"""
+        code = normalize_isrc(isrc)
+        if not code:
+            return None, "Некорректный ISRC"
+
+        tracks, status = self.search_track(f"isrc:{code}", market)
+        if not tracks:
+            return None, status
+
+        # Оставляем только записи с тем же ISRC, если Spotify его вернул
+        exact = [
+            track for track in tracks
+            if normalize_isrc((track.get('external_ids') or {}).get('isrc')) in (code, None)
+        ]
+        if not exact:
+            return None, "Треки не найдены"
+        return exact, "OK"
+
+    def get_search_cache_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кэша поиска"""
+        if not self.search_cache:
+            return {'hits': 0, 'misses': 0, 'entries': 0, 'hit_rate': 0.0}
+        return self.search_cache.get_stats()
+            
     def get_track_by_url(self, url: str) -> Tuple[Optional[Dict[str, Any]], str]:
         """Получает информацию о треке по ссылке Spotify"""
-        import re
-        
         track_id = re.search(r'track/([a-zA-Z0-9]+)', url)
         if not track_id:
             return None, "Неверный формат ссылки"
@@ -471,7 +603,8 @@ class SpotifyClient:
         headers = {"Authorization": f"Bearer {token}"}
         
         try:
-            response = requests.get(
+            response = self._request(
+                "GET",
                 f"https://api.spotify.com/v1/tracks/{track_id.group(1)}",
                 headers=headers,
                 timeout=10
@@ -503,7 +636,8 @@ class SpotifyClient:
             "Content-Type": "application/json"
         }
         
-        response = requests.get(
+        response = self._request(
+            "GET",
             "https://api.spotify.com/v1/me",
             headers=headers
         )
@@ -522,7 +656,8 @@ class SpotifyClient:
             "Content-Type": "application/json"
         }
 
-        response = requests.get(
+        response = self._request(
+            "GET",
             "https://api.spotify.com/v1/me/tracks",
             headers=headers,
             params={"limit": 1}
@@ -534,44 +669,56 @@ class SpotifyClient:
 
         return response.json()["total"]
 
-    def get_liked_tracks_batches(self, batch_size: int = 50) -> Generator[List[Dict], None, None]:
-        """Получает любимые треки порциями"""
+    def get_liked_tracks_batches(self, batch_size: int = 50,
+                                 max_workers: Optional[int] = None) -> Generator[List[Dict], None, None]:
+        """Получает любимые треки порциями
+        
+        Первая страница запрашивается отдельно, чтобы узнать общее количество
+        треков, остальные загружаются параллельно. Порции выдаются по порядку.
+        """
         user_token = self.get_user_token()
         headers = {
             "Authorization": f"Bearer {user_token}",
             "Content-Type": "application/json"
         }
-
-        offset = 0
-        total = None
-
-        while True:
-            logger.debug(f"Получение порции треков с offset={offset}")
-            response = requests.get(
-                "https://api.spotify.com/v1/me/tracks",
-                headers=headers,
-                params={"limit": batch_size, "offset": offset}
-            )
-
-            if response.status_code != 200:
-                logger.error(f"Ошибка получения треков: {response.text}")
-                raise Exception(f"Ошибка получения любимых треков: {response.text}")
-
-            data = response.json()
-            if total is None:
-                total = data["total"]
-                logger.info(f"Всего треков: {total}")
-
-            tracks = data["items"]
-            if not tracks:
-                break
-
-            logger.debug(f"Получено {len(tracks)} треков")
-            yield tracks
+        
+        data = self._fetch_liked_page(headers, 0, batch_size)
+        total = data["total"]
+        logger.info(f"Всего треков: {total}")
+        
+        if not data["items"]:
+            return
+        yield data["items"]
+        
+        workers = max(1, int(max_workers or get_setting('liked_tracks_workers')))
+        offsets = range(batch_size, total, batch_size)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="liked-tracks")
+        try:
+            fetch = lambda offset: self._fetch_liked_page(headers, offset, batch_size)
+            for offset, future in ordered_map(executor, fetch, offsets, workers):
+                tracks = future.result()["items"]
+                if not tracks:
+                    continue
+                logger.debug(f"Получено {len(tracks)} треков с offset={offset}")
+                yield tracks
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
             
-            offset += batch_size
-            if offset >= total:
-                break
+    def _fetch_liked_page(self, headers: Dict[str, str], offset: int, limit: int) -> Dict[str, Any]:
+        """Загружает одну страницу любимых треков"""
+        logger.debug(f"Получение порции треков с offset={offset}")
+        response = self._request(
+            "GET",
+            "https://api.spotify.com/v1/me/tracks",
+            headers=headers,
+            params={"limit": limit, "offset": offset}
+        )
+        
+        if response.status_code != 200:
+            logger.error(f"Ошибка получения треков: {response.text}")
+            raise Exception(f"Ошибка получения любимых треков: {response.text}")
+            
+        return response.json()
 
     def add_to_liked_tracks(self, track_ids: List[str]) -> None:
         """Добавляет треки в любимые"""
@@ -584,7 +731,8 @@ class SpotifyClient:
         # Добавляем треки порциями по 50 штук
         for i in range(0, len(track_ids), 50):
             chunk = track_ids[i:i + 50]
-            response = requests.put(
+            response = self._request(
+                "PUT",
                 "https://api.spotify.com/v1/me/tracks",
                 headers=headers,
                 json={"ids": chunk}
@@ -592,44 +740,22 @@ class SpotifyClient:
             if response.status_code not in [200, 201]:
                 raise Exception(f"Ошибка добавления треков в любимые: {response.text}")
 
-    def restore_from_backup(self, backup_file: str) -> Tuple[int, str]:
+    def restore_from_backup(self, backup_file: str, skip_liked: bool = False) -> Tuple[int, str]:
         """Восстанавливает треки из бэкапа в любимые треки
         
         Args:
             backup_file: Путь к файлу бэкапа
+            skip_liked: Не отправлять треки, которые уже есть в любимых
             
         Returns:
             Tuple[int, str]: Количество восстановленных треков и сообщение о результате
         """
         try:
-            # Читаем файл бэкапа
-            with open(backup_file, 'r', encoding='utf-8') as f:
-                backup_data = json.load(f)
-                
-            if not isinstance(backup_data, dict) or 'tracks' not in backup_data:
-                return 0, "Неверный формат файла бэкапа"
-                
-            tracks = backup_data['tracks']
-            if not tracks:
-                return 0, "В бэкапе нет треков"
-                
-            # Извлекаем ID треков из URI
-            track_ids = []
-            for track in tracks:
-                if 'spotify_uri' in track:
-                    track_id = track['spotify_uri'].split(':')[-1]
-                    track_ids.append(track_id)
-                    
-            if not track_ids:
-                return 0, "Не найдено действительных ID треков"
-                
-            # Добавляем треки в любимые
-            self.add_to_liked_tracks(track_ids)
-            
-            return len(track_ids), "Треки успешно восстановлены"
-            
+            return RestoreEngine(self, backup_file, skip_liked=skip_liked).run()
         except json.JSONDecodeError:
             return 0, "Ошибка чтения файла бэкапа: неверный формат JSON"
+        except ValueError as e:
+            return 0, str(e)
         except Exception as e:
             return 0, f"Ошибка при восстановлении: {str(e)}"
 
@@ -645,7 +771,8 @@ class SpotifyClient:
         # Проверяем треки порциями по 50 штук
         for i in range(0, len(track_ids), 50):
             chunk = track_ids[i:i + 50]
-            response = requests.get(
+            response = self._request(
+                "GET",
                 "https://api.spotify.com/v1/me/tracks/contains",
                 headers=headers,
                 params={"ids": ",".join(chunk)}
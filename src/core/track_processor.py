@@ -1,94 +1,361 @@
 import os
-from typing import List, Dict, Optional, Tuple
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Dict, Optional, Tuple
 from mutagen import File
 from PyQt6.QtCore import QObject, pyqtSignal
 import re
+import itertools
+from functools import lru_cache
+import queue
+import logging
+import threading
+import time
+from src.core.library_index import LibraryIndex
+from src.core.matcher import MatchScorer, normalize_isrc
+from src.utils.concurrency import ordered_map
+from src.utils.settings import get_setting
+
+logger = logging.getLogger(__name__)
+
+_DOMAIN = r'\.(?:com|ru|net|org|cc|me|io)'
+
+# Шаблоны мусора применяются по очереди, как и прежде: URL, скобки с доменами,
+# "downloaded from", "from <домен>". Объединять их в одно выражение нельзя -
+# результат отличается, когда совпадения перекрываются (например,
+# "[y.net] from [y.net]"). Выражения компилируются один раз при импорте.
+_JUNK_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'https?://\S+',
+    r'\[.*?' + _DOMAIN + r'[^\]]*?\]',
+    r'\(.*?' + _DOMAIN + r'[^)]*?\)',
+    r'(?i)downloaded\s+from\s+.*?(?=\s|$)',
+    r'(?i)from\s+.*?' + _DOMAIN + r'.*?(?=\s|$)',
+))
+
+CLEAN_METADATA_CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CLEAN_METADATA_CACHE_SIZE)
+def _clean_metadata_cached(text: str) -> str:
+    """Удаляет мусор и схлопывает пробелы; результат кэшируется по исходной строке"""
+    for pattern in _JUNK_PATTERNS:
+        text = pattern.sub('', text)
+    return ' '.join(text.split())
 
 class TrackProcessor(QObject):
     progress_updated = pyqtSignal(int, int)  # current, total
     status_updated = pyqtSignal(str)
     track_processed = pyqtSignal(dict)  # track info
-    error_occurred = pyqtSignal(str, str)  # filename, error message
+    error_occurred = pyqtSignal(str, str)  # file path, error message
     
-    def __init__(self):
+    def __init__(self, use_index: Optional[bool] = None):
         super().__init__()
         self.valid_extensions = {".mp3", ".flac", ".wav", ".aac", ".ogg", ".m4a"}
+        self.scanned_files: List[str] = []
+        self.scan_complete = False
+        self.matcher = MatchScorer()
+        # Задержки сканирования и чтения тегов по файлам текущего запуска, в миллисекундах
+        self.file_timings: Dict[str, Dict[str, float]] = {}
+        
+        # Индекс библиотеки позволяет не перечитывать неизмененные файлы
+        self.library_index = None
+        if use_index if use_index is not None else get_setting('library_index'):
+            try:
+                self.library_index = LibraryIndex()
+            except Exception as e:
+                logger.warning(f"Индекс библиотеки недоступен: {str(e)}")
         
     def get_audio_files(self, directory: str) -> List[str]:
         """Получает список всех аудиофайлов в директории"""
-        audio_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if os.path.splitext(file)[1].lower() in self.valid_extensions:
-                    audio_files.append(os.path.join(root, file))
-        return audio_files
+        return list(self.iter_audio_files(directory))
+        
+    def iter_audio_files(self, directory: str) -> Iterator[str]:
+        """Обходит директорию через os.scandir и выдает аудиофайлы по мере обнаружения"""
+        self.scanned_files = []
+        self.scan_complete = False
+        stack = [directory]
+        
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+                
+            subdirs = []
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in self.valid_extensions:
+                        self.scanned_files.append(entry.path)
+                        yield entry.path
+                except OSError:
+                    continue
+            # Сохраняем порядок обхода, как у os.walk
+            stack.extend(reversed(subdirs))
+            
+        self.scan_complete = True
+        
+    def scan_ahead(self, directory: str, is_running: Callable[[], bool]) -> Iterator[str]:
+        """Сканирует директорию в фоновом потоке и выдает файлы, не дожидаясь конца обхода
+        
+        Число найденных на текущий момент файлов доступно в scanned_count.
+        """
+        found = queue.Queue()
+        done = object()
+        self.scanned_files = []
+        self.scan_complete = False
+        
+        self.file_timings = {}
+        
+        def scan():
+            try:
+                last = time.perf_counter()
+                for file_path in self.iter_audio_files(directory):
+                    if not is_running():
+                        break
+                    now = time.perf_counter()
+                    self.file_timings[file_path] = {'scan': round((now - last) * 1000, 2)}
+                    last = now
+                    found.put(file_path)
+            finally:
+                found.put(done)
         
+        threading.Thread(target=scan, name="library-scan", daemon=True).start()
+        while True:
+            file_path = found.get()
+            if file_path is done:
+                return
+            yield file_path
+            
+    @property
+    def scanned_count(self) -> int:
+        """Число аудиофайлов, найденных при текущем сканировании"""
+        return len(self.scanned_files)
+        
+    def finish_scan(self, directory: str, audio_files: List[str]) -> None:
+        """Удаляет из индекса файлы, которых больше нет в просканированной директории"""
+        if self.library_index:
+            self.library_index.prune(directory, audio_files)
+            
     def extract_metadata(self, file_path: str) -> Optional[Tuple[str, str, float]]:
         """Извлекает метаданные из аудиофайла"""
+        return self.lookup_file(file_path)[0]
+        
+    def lookup_file(self, file_path: str) -> Tuple[Optional[Tuple[str, str, float]], Optional[Dict], Optional[str]]:
+        """Возвращает метаданные файла, найденный ранее трек Spotify (если файл не изменился) и ISRC"""
         try:
-            audio = File(file_path, easy=True)
-            if audio is None:
-                return None
-                
-            title = audio.get("title", [None])[0]
-            artist = audio.get("artist", [None])[0]
+            fingerprint, cached = self._lookup_index(file_path)
+            if cached is not None:
+                return cached
             
-            duration = None
-            if hasattr(audio.info, 'length'):
-                duration = audio.info.length
-                
-            if title is not None:
-                title = self.clean_metadata(title)
-            if artist is not None:
-                artist = self.clean_metadata(artist)
-                
-            return title, artist, duration
+            metadata, isrc = read_audio_file(file_path)
+            if fingerprint is not None:
+                self.library_index.store_metadata(file_path, *fingerprint, metadata, isrc)
+            return metadata, None, isrc
             
         except Exception as e:
-            self.error_occurred.emit(os.path.basename(file_path), f"Ошибка чтения метаданных: {str(e)}")
-            return None
+            self.error_occurred.emit(file_path, f"Ошибка чтения метаданных: {str(e)}")
+            return None, None, None
+            
+    def iter_metadata(self, file_paths: Iterable[str], is_running: Optional[Callable[[], bool]] = None
+                      ) -> Iterator[Tuple[str, Optional[Tuple[str, str, float]], Optional[Dict], Optional[str]]]:
+        """Извлекает метаданные файлов параллельно и выдает их в исходном порядке
+        
+        Для каждого файла выдается (путь, метаданные, найденный ранее трек, ISRC).
+        Неизмененные файлы берутся из индекса, остальные читаются пакетами в пуле
+        процессов. Результаты начинают поступать, не дожидаясь конца списка файлов.
+        Если процесс пула аварийно завершился, неполученные пакеты перечитываются
+        в пуле потоков.
+        """
+        workers = max(1, int(get_setting('metadata_workers') or os.cpu_count() or 4))
+        batch_size = max(1, int(get_setting('metadata_batch_size')))
+        executor = self._create_executor(workers)
+        jobs: Iterator = self._metadata_jobs(file_paths, batch_size, is_running)
+        # Пакеты, переданные в пул, но еще не выданные; их перечитывают, если пул сломался
+        submitted: Deque[Tuple[List[str], List[Tuple]]] = deque()
+        
+        def track_submitted(source):
+            for job in source:
+                submitted.append(job)
+                yield job
+        
+        try:
+            while True:
+                try:
+                    for (paths_to_read, entries), future in ordered_map(
+                            executor, _read_tags_batch, track_submitted(jobs), workers * 2, is_running):
+                        try:
+                            read_results = iter(future.result())
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            read_results = iter([(None, None, str(e), None)] * len(paths_to_read))
+                        submitted.popleft()
+                        yield from self._batch_metadata(entries, read_results)
+                    return
+                except BrokenProcessPool as e:
+                    logger.warning(f"Пул процессов аварийно завершился, чтение тегов продолжается в потоках: {str(e)}")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metadata")
+                    jobs = itertools.chain(list(submitted), jobs)
+                    submitted.clear()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            
+    def _batch_metadata(self, entries: List[Tuple], read_results: Iterator[Tuple]
+                        ) -> Iterator[Tuple[str, Optional[Tuple[str, str, float]], Optional[Dict], Optional[str]]]:
+        """Выдает метаданные файлов пакета: из индекса или прочитанные пулом"""
+        for file_path, fingerprint, cached in entries:
+            if cached is not None:
+                yield (file_path,) + cached
+                continue
+            
+            metadata, isrc, error, elapsed = next(read_results)
+            if elapsed is not None:
+                self.file_timings.setdefault(file_path, {})['tag_read'] = round(elapsed * 1000, 2)
+            if error is not None:
+                self.error_occurred.emit(file_path, f"Ошибка чтения метаданных: {error}")
+            elif fingerprint is not None:
+                self.library_index.store_metadata(file_path, *fingerprint, metadata, isrc)
+            yield file_path, metadata, None, isrc
+            
+    def pop_timings(self, file_path: str) -> Dict[str, float]:
+        """Возвращает и забывает задержки сканирования и чтения тегов файла"""
+        return self.file_timings.pop(file_path, {})
+            
+    def _metadata_jobs(self, file_paths: Iterable[str], batch_size: int,
+                       is_running: Optional[Callable[[], bool]]) -> Iterator[Tuple[List[str], List[Tuple]]]:
+        """Группирует файлы в пакеты, отделяя найденные в индексе от требующих чтения"""
+        paths_to_read: List[str] = []
+        entries: List[Tuple] = []
+        
+        for file_path in file_paths:
+            if is_running is not None and not is_running():
+                return
+            try:
+                fingerprint, cached = self._lookup_index(file_path)
+            except OSError:
+                fingerprint, cached = None, None
+            if cached is None:
+                paths_to_read.append(file_path)
+            entries.append((file_path, fingerprint, cached))
+            
+            if len(paths_to_read) >= batch_size or len(entries) >= batch_size * 4:
+                yield paths_to_read, entries
+                paths_to_read, entries = [], []
+        
+        if entries:
+            yield paths_to_read, entries
+            
+    def _lookup_index(self, file_path: str) -> Tuple[Optional[Tuple[int, float]], Optional[Tuple]]:
+        """Ищет файл в индексе: возвращает отпечаток и (метаданные, трек Spotify, ISRC) для неизмененного файла"""
+        if not self.library_index:
+            return None, None
+            
+        fingerprint = LibraryIndex.fingerprint(file_path)
+        entry = self.library_index.lookup(file_path, *fingerprint)
+        if entry is None:
+            return fingerprint, None
+            
+        metadata = None
+        if entry['readable']:
+            metadata = (entry['title'], entry['artist'], entry['duration'])
+        resolved_track = None
+        if entry['spotify_uri']:
+            resolved_track = {
+                'id': entry['spotify_uri'].split(':')[-1],
+                'uri': entry['spotify_uri'],
+                'name': entry['spotify_name'],
+                'artists': [{'name': entry['spotify_artist']}]
+            }
+        return fingerprint, (metadata, resolved_track, entry['isrc'])
+        
+    @staticmethod
+    def _create_executor(workers: int) -> Executor:
+        """Создает пул для чтения тегов: процессы по умолчанию, потоки как запасной вариант"""
+        if get_setting('metadata_executor') == 'process':
+            try:
+                return ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError, ImportError) as e:
+                logger.warning(f"Пул процессов недоступен, используются потоки: {str(e)}")
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="metadata")
+            
+    def remember_match(self, file_path: str, track: Dict, flush: bool = False) -> None:
+        """Сохраняет в индексе трек Spotify, выбранный для файла"""
+        if self.library_index:
+            self.library_index.set_spotify_track(file_path, track)
+            if flush:
+                self.library_index.flush()
+            
+    def close(self) -> None:
+        """Сохраняет накопленные изменения индекса"""
+        if self.library_index:
+            self.library_index.flush()
             
     @staticmethod
     def clean_metadata(text: str) -> str:
         """Очищает метаданные от мусора"""
         if not text:
             return text
-            
-        # Удаляем URL
-        text = re.sub(r'https?://\S+', '', text)
-        
-        # Удаляем текст в скобках с доменными именами
-        text = re.sub(r'\[(.*?(?:\.(?:com|ru|net|org|cc|me|io))[^\]]*?)\]', '', text)
-        text = re.sub(r'\((.*?(?:\.(?:com|ru|net|org|cc|me|io))[^)]*?)\)', '', text)
-        
-        # Удаляем фразы типа "downloaded from"
-        text = re.sub(r'(?i)downloaded\s+from\s+.*?(?=\s|$)', '', text)
-        text = re.sub(r'(?i)from\s+.*?(?:\.(?:com|ru|net|org|cc|me|io)).*?(?=\s|$)', '', text)
-        
-        # Очищаем от множественных пробелов
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        
-        return text
+        return _clean_metadata_cached(text)
         
     def verify_track(self, found_track: Dict, original_duration: Optional[float],
                     original_title: Optional[str], original_artist: Optional[str]) -> Tuple[bool, str]:
         """Проверяет соответствие найденного трека оригинальному"""
-        if original_duration:
+        metadata = (original_title, original_artist, original_duration)
+        result = self.matcher.compare(metadata, found_track)
+        
+        if original_duration and not self.matcher.is_duration_match(metadata, found_track):
             track_duration = found_track['duration_ms'] / 1000
-            if abs(original_duration - track_duration) > 2:
-                return False, f"Несовпадение длительности: оригинал {original_duration}с, найдено {track_duration}с"
+            return False, f"Несовпадение длительности: оригинал {original_duration}с, найдено {track_duration}с"
         
         if original_title and original_artist:
-            clean_orig_title = self.clean_metadata(original_title.lower())
-            clean_orig_artist = self.clean_metadata(original_artist.lower())
-            clean_found_title = self.clean_metadata(found_track['name'].lower())
-            clean_found_artist = self.clean_metadata(found_track['artists'][0]['name'].lower())
-            
-            if not (clean_orig_title in clean_found_title or clean_found_title in clean_orig_title):
-                return False, f"Несовпадение названия: '{clean_orig_title}' != '{clean_found_title}'"
+            if not self.matcher.is_field_match(result.title):
+                return False, f"Несовпадение названия: '{original_title}' != '{found_track['name']}'"
                 
-            if not (clean_orig_artist in clean_found_artist or clean_found_artist in clean_orig_artist):
-                return False, f"Несовпадение исполнителя: '{clean_orig_artist}' != '{clean_found_artist}'"
+            if not self.matcher.is_field_match(result.artist):
+                found_artists = ', '.join(a['name'] for a in found_track['artists'])
+                return False, f"Несовпадение исполнителя: '{original_artist}' != '{found_artists}'"
+        
+        return True, "Трек соответствует"
+
+def read_audio_file(file_path: str) -> Tuple[Optional[Tuple[str, str, float]], Optional[str]]:
+    """Читает теги аудиофайла и его ISRC, если он указан"""
+    audio = File(file_path, easy=True)
+    if audio is None:
+        return None, None
+        
+    title = audio.get("title", [None])[0]
+    artist = audio.get("artist", [None])[0]
+    
+    duration = None
+    if hasattr(audio.info, 'length'):
+        duration = audio.info.length
+        
+    if title is not None:
+        title = TrackProcessor.clean_metadata(title)
+    if artist is not None:
+        artist = TrackProcessor.clean_metadata(artist)
         
-        return True, "Трек соответствует" 
\ No newline at end of file
+    isrc = normalize_isrc(audio.get("isrc", [None])[0])
+        
+    return (title, artist, duration), isrc
+
+def _read_tags_batch(job: Tuple[List[str], Any]) -> List[Tuple[Optional[Tuple[str, str, float]], Optional[str], Optional[str], float]]:
+    """Читает теги и ISRC пакета файлов; выполняется в отдельном процессе
+
+    Для каждого файла возвращает (метаданные, ISRC, ошибка, время чтения в секундах).
+    """
+    results = []
+    for file_path in job[0]:
+        started = time.perf_counter()
+        try:
+            metadata, isrc = read_audio_file(file_path)
+            results.append((metadata, isrc, None, time.perf_counter() - started))
+        except Exception as e:
+            results.append((None, None, str(e), time.perf_counter() - started))
+    return results
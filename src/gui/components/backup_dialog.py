@@ -2,7 +2,6 @@ import sys
 import json
 import os
 import logging
-from datetime import datetime
 from typing import List, Dict, Optional
 
 # Настройка логирования
@@ -19,11 +18,14 @@ logger.addHandler(console_handler)
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
     QLabel, QFileDialog, QProgressBar, QMessageBox,
-    QFrame, QWidget
+    QFrame, QWidget, QCheckBox
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QThread, QTimer
 from PyQt6.QtGui import QIcon, QWindow
 from src.core.spotify_client import SpotifyClient
+from src.core.backup_format import BackupWriter, find_incomplete_backup, format_track, iter_snapshot_tracks
+from src.core.request_scheduler import RequestCancelled
+from src.core.restore_engine import RestoreEngine
 
 # Импортируем поддержку уведомлений Windows
 NOTIFICATIONS_SUPPORTED = False
@@ -53,15 +55,22 @@ class BackupThread(QThread):
     error_occurred = pyqtSignal(str)
     finished = pyqtSignal()
 
-    def __init__(self, spotify_client, output_file):
+    def __init__(self, spotify_client, output_file, base_backup: Optional[str] = None):
         super().__init__()
         self.spotify_client = spotify_client
         self.output_file = output_file
+        self.base_backup = base_backup
         self.is_running = False
 
+    def cancel(self):
+        """Останавливает бэкап и прерывает ожидание запросов к Spotify"""
+        self.is_running = False
+        self.spotify_client.scheduler.cancel()
+
     def run(self):
         try:
             self.is_running = True
+            self.spotify_client.scheduler.reset()
             self.status_updated.emit("Получение списка любимых треков...")
             logger.info("Начинаем процесс бэкапа")
             
@@ -76,64 +85,83 @@ class BackupThread(QThread):
                 
             self.status_updated.emit(f"Всего треков для сохранения: {total_tracks}")
             
-            # Получаем треки порциями
-            formatted_tracks = []
+            # Треки записываются в файл по мере получения порций
             processed_count = 0
+            spotify_user = self.spotify_client.get_current_user_id()
             
-            for tracks_batch in self.spotify_client.get_liked_tracks_batches():
-                if not self.is_running:
-                    logger.info("Процесс бэкапа был прерван")
-                    break
-                
-                logger.debug(f"Получена новая порция треков: {len(tracks_batch)} шт.")
-                
-                for track_item in tracks_batch:
+            # В инкрементальном режиме сохраняются только треки, которых нет в базовом бэкапе
+            known_uris = None
+            header_fields = {}
+            expected_count = total_tracks
+            incomplete = find_incomplete_backup(self.base_backup) if self.base_backup else None
+            if incomplete:
+                # Недописанный бэкап не содержит старых треков, поэтому остановка на известной
+                # странице потеряла бы их: сохраняем библиотеку целиком
+                logger.warning(f"Бэкап {incomplete} не завершен, создается полный бэкап")
+                self.status_updated.emit("Предыдущий бэкап неполный, создается полный бэкап...")
+            elif self.base_backup:
+                self.status_updated.emit("Чтение предыдущего бэкапа...")
+                known_uris = {
+                    track['spotify_uri'] for track in iter_snapshot_tracks(self.base_backup)
+                    if 'spotify_uri' in track
+                }
+                header_fields = {'mode': 'incremental', 'base_backup': os.path.abspath(self.base_backup)}
+                expected_count = max(total_tracks - len(known_uris), 1)
+                logger.info(f"В базовом бэкапе {len(known_uris)} треков")
+            
+            # Для инкрементального бэкапа страницы читаются по одной от новых к старым,
+            # чтобы остановиться на первой полностью известной странице
+            batches = self.spotify_client.get_liked_tracks_batches(
+                max_workers=1 if known_uris is not None else None
+            )
+            
+            with BackupWriter(self.output_file, spotify_user, total_tracks, **header_fields) as writer:
+                for tracks_batch in batches:
                     if not self.is_running:
+                        logger.info("Процесс бэкапа был прерван")
                         break
-                        
-                    track = track_item['track']
-                    track_name = track['name']
-                    artist_name = track['artists'][0]['name']
                     
-                    logger.debug(f"Обработка трека: {track_name} - {artist_name}")
-                    self.track_info_updated.emit(f"{track_name} - {artist_name}")
+                    logger.debug(f"Получена новая порция треков: {len(tracks_batch)} шт.")
                     
-                    formatted_track = {
-                        'name': track_name,
-                        'artist': artist_name,
-                        'album': track['album']['name'],
-                        'spotify_uri': track['uri'],
-                        'duration_ms': track['duration_ms'],
-                        'preview_url': track['preview_url']
-                    }
-                    formatted_tracks.append(formatted_track)
+                    formatted_tracks = [format_track(track_item) for track_item in tracks_batch]
+                    if known_uris is not None:
+                        formatted_tracks = [
+                            track for track in formatted_tracks if track['spotify_uri'] not in known_uris
+                        ]
+                        if not formatted_tracks:
+                            logger.info("Достигнута часть библиотеки, уже сохраненная в базовом бэкапе")
+                            break
+                    writer.write_tracks(formatted_tracks)
                     
-                    processed_count += 1
-                    progress = int((processed_count / total_tracks) * 100)
-                    logger.debug(f"Прогресс: {progress}% ({processed_count}/{total_tracks})")
+                    last_track = formatted_tracks[-1]
+                    self.track_info_updated.emit(f"{last_track['name']} - {last_track['artist']}")
+                    
+                    processed_count += len(formatted_tracks)
+                    progress = min(int((processed_count / expected_count) * 100), 100)
+                    logger.debug(f"Прогресс: {progress}% ({processed_count}/{expected_count})")
                     self.progress_updated.emit(progress)
-                    self.status_updated.emit(f"Обработано {processed_count} из {total_tracks} треков")
-            
-            # Сохраняем в файл
-            self.status_updated.emit("Сохранение файла бэкапа...")
-            self.track_info_updated.emit("Завершение работы...")
-            logger.info("Сохранение результатов в файл")
+                    if known_uris is not None:
+                        self.status_updated.emit(f"Найдено новых треков: {processed_count}")
+                    else:
+                        self.status_updated.emit(f"Обработано {processed_count} из {total_tracks} треков")
+                
+                self.status_updated.emit("Сохранение файла бэкапа...")
+                self.track_info_updated.emit("Завершение работы...")
+                writer.close(complete=self.is_running)
             
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                backup_data = {
-                    'tracks': formatted_tracks,
-                    'total': len(formatted_tracks),
-                    'version': '1.0',
-                    'created_at': datetime.now().isoformat(),
-                    'spotify_user': self.spotify_client.get_current_user_id()
-                }
-                json.dump(backup_data, f, ensure_ascii=False, indent=2)
+            if not self.is_running:
+                logger.info(f"Бэкап прерван, файл неполный: {self.output_file}")
+                self.status_updated.emit(f"Бэкап прерван, сохранено {processed_count} треков")
+                return
             
+            self.progress_updated.emit(100)
             logger.info(f"Бэкап успешно создан: {self.output_file}")
-            self.status_updated.emit(f"Бэкап успешно создан! Сохранено {len(formatted_tracks)} треков")
+            self.status_updated.emit(f"Бэкап успешно создан! Сохранено {processed_count} треков")
             self.track_info_updated.emit("Готово!")
             self.finished.emit()
             
+        except RequestCancelled:
+            logger.info(f"Бэкап отменен, файл неполный: {self.output_file}")
         except Exception as e:
             logger.error(f"Ошибка при создании бэкапа: {str(e)}", exc_info=True)
             self.error_occurred.emit(str(e))
@@ -146,22 +174,35 @@ class RestoreThread(QThread):
     error_occurred = pyqtSignal(str)
     finished = pyqtSignal()
 
-    def __init__(self, spotify_client, backup_file):
+    def __init__(self, spotify_client, backup_file, skip_liked: bool = True):
         super().__init__()
         self.spotify_client = spotify_client
         self.backup_file = backup_file
+        self.skip_liked = skip_liked
+        self.is_running = False
+
+    def cancel(self):
+        """Останавливает восстановление и прерывает ожидание запросов к Spotify"""
         self.is_running = False
+        self.spotify_client.scheduler.cancel()
 
     def run(self):
         try:
             self.is_running = True
+            self.spotify_client.scheduler.reset()
             self.status_updated.emit("Восстановление треков из бэкапа...")
             logger.info("Начинаем процесс восстановления")
             
-            restored_count, message = self.spotify_client.restore_from_backup(self.backup_file)
+            engine = RestoreEngine(self.spotify_client, self.backup_file, skip_liked=self.skip_liked)
+            try:
+                restored_count, message = engine.run(self.report_progress, lambda: self.is_running)
+            except json.JSONDecodeError:
+                restored_count, message = 0, "Ошибка чтения файла бэкапа: неверный формат JSON"
+            except ValueError as e:
+                restored_count, message = 0, str(e)
             
-            if restored_count > 0:
-                self.status_updated.emit(f"Восстановлено {restored_count} треков")
+            if restored_count > 0 and engine.completed:
+                self.status_updated.emit(message)
                 logger.info(f"Восстановлено {restored_count} треков")
                 self.finished.emit()
             else:
@@ -173,6 +214,11 @@ class RestoreThread(QThread):
             self.error_occurred.emit(str(e))
         finally:
             self.is_running = False
+            
+    def report_progress(self, restored: int, total: int):
+        """Передает в интерфейс прогресс восстановления"""
+        self.progress_updated.emit(int((restored / total) * 100))
+        self.status_updated.emit(f"Восстановлено {restored} из {total} треков")
 
 class ModernButton(QPushButton):
     def __init__(self, text, parent=None):
@@ -272,7 +318,7 @@ class BackupDialog(QDialog):
         # Описание
         description = QLabel(
             "Создайте бэкап ваших любимых треков или восстановите их из существующего бэкапа. "
-            "Бэкап сохраняется в JSON файл, который можно использовать для восстановления."
+            "Бэкап сохраняется в файл JSON Lines, который можно использовать для восстановления."
         )
         description.setWordWrap(True)
         description.setStyleSheet("""
@@ -328,14 +374,25 @@ class BackupDialog(QDialog):
         
         layout.addWidget(self.progress_frame)
         
+        # Режим восстановления без повторной отправки уже добавленных треков
+        self.skip_liked_checkbox = QCheckBox("При восстановлении пропускать треки, которые уже есть в любимых")
+        self.skip_liked_checkbox.setChecked(True)
+        self.skip_liked_checkbox.setStyleSheet("color: #B3B3B3;")
+        layout.addWidget(self.skip_liked_checkbox)
+        
         # Кнопки
         buttons_layout = QHBoxLayout()
         buttons_layout.setSpacing(10)
         
         self.backup_button = ModernButton("Создать бэкап")
-        self.backup_button.clicked.connect(self.start_backup)
+        self.backup_button.clicked.connect(lambda: self.start_backup())
         buttons_layout.addWidget(self.backup_button)
         
+        self.incremental_button = ModernButton("Инкрементальный бэкап")
+        self.incremental_button.setProperty("class", "secondary")
+        self.incremental_button.clicked.connect(self.start_incremental_backup)
+        buttons_layout.addWidget(self.incremental_button)
+        
         self.restore_button = ModernButton("Восстановить из бэкапа")
         self.restore_button.setProperty("class", "secondary")
         self.restore_button.clicked.connect(self.start_restore)
@@ -360,13 +417,30 @@ class BackupDialog(QDialog):
                 logger.error(f"Ошибка инициализации таскбара: {str(e)}")
                 self.taskbar = None
 
-    def start_backup(self):
+    def start_incremental_backup(self):
+        """Запускает бэкап только новых треков относительно предыдущего бэкапа"""
+        base_file = QFileDialog.getOpenFileName(
+            self,
+            "Выбрать предыдущий бэкап",
+            os.path.expanduser("~/Desktop"),
+            "Файлы бэкапа (*.jsonl *.json)"
+        )[0]
+        
+        if not base_file:
+            logger.info("Пользователь отменил выбор базового бэкапа")
+            return
+            
+        logger.info(f"Выбран базовый бэкап: {base_file}")
+        self.start_backup(base_file)
+        
+    def start_backup(self, base_backup: Optional[str] = None):
         logger.info("Запуск процесса бэкапа")
+        default_name = "spotify_favorites_incremental.jsonl" if base_backup else "spotify_favorites_backup.jsonl"
         file_name = QFileDialog.getSaveFileName(
             self,
             "Сохранить бэкап",
-            os.path.expanduser("~/Desktop/spotify_favorites_backup.json"),
-            "JSON файлы (*.json)"
+            os.path.expanduser(f"~/Desktop/{default_name}"),
+            "Бэкап JSON Lines (*.jsonl)"
         )[0]
         
         if not file_name:
@@ -375,11 +449,12 @@ class BackupDialog(QDialog):
             
         logger.info(f"Выбран файл для сохранения: {file_name}")
         self.backup_button.setEnabled(False)
+        self.incremental_button.setEnabled(False)
         self.restore_button.setEnabled(False)
         self.progress_bar.show()
         self.progress_bar.setValue(0)
         
-        self.backup_thread = BackupThread(self.spotify_client, file_name)
+        self.backup_thread = BackupThread(self.spotify_client, file_name, base_backup)
         self.backup_thread.progress_updated.connect(self.update_progress)
         self.backup_thread.status_updated.connect(self.update_status)
         self.backup_thread.track_info_updated.connect(self.update_track_info)
@@ -395,7 +470,7 @@ class BackupDialog(QDialog):
             self,
             "Выбрать файл бэкапа",
             os.path.expanduser("~/Desktop"),
-            "JSON файлы (*.json)"
+            "Файлы бэкапа (*.jsonl *.json)"
         )[0]
         
         if not file_name:
@@ -416,11 +491,17 @@ class BackupDialog(QDialog):
             return
             
         self.backup_button.setEnabled(False)
+        self.incremental_button.setEnabled(False)
         self.restore_button.setEnabled(False)
         self.progress_bar.show()
         self.progress_bar.setValue(0)
         
-        self.restore_thread = RestoreThread(self.spotify_client, file_name)
+        self.restore_thread = RestoreThread(
+            self.spotify_client,
+            file_name,
+            skip_liked=self.skip_liked_checkbox.isChecked()
+        )
+        self.restore_thread.progress_updated.connect(self.update_progress)
         self.restore_thread.status_updated.connect(self.status_label.setText)
         self.restore_thread.error_occurred.connect(self.handle_error)
         self.restore_thread.finished.connect(self.restore_finished)
@@ -505,6 +586,7 @@ class BackupDialog(QDialog):
     def reset_ui(self):
         """Сбрасывает состояние UI"""
         self.backup_button.setEnabled(True)
+        self.incremental_button.setEnabled(True)
         self.restore_button.setEnabled(True)
         self.progress_bar.hide()
         self.progress_bar.setValue(0)
@@ -527,11 +609,11 @@ class BackupDialog(QDialog):
         """Обработчик закрытия окна"""
         if self.backup_thread and self.backup_thread.is_running:
             logger.info("Отмена процесса бэкапа")
-            self.backup_thread.is_running = False
+            self.backup_thread.cancel()
             self.backup_thread.wait()
         if self.restore_thread and self.restore_thread.is_running:
             logger.info("Отмена процесса восстановления")
-            self.restore_thread.is_running = False
+            self.restore_thread.cancel()
             self.restore_thread.wait()
             
         # Сбрасываем прогресс в таскбаре при закрытии
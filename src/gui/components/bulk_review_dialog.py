@@ -0,0 +1,236 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+    QTableView, QHeaderView, QAbstractItemView
+)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QKeySequence, QShortcut, QColor
+from src.gui.styles.modern_style import DIALOG_STYLE
+from src.gui.components.track_selection_dialog import ModernButton, TrackSelectionDialog
+from src.core.manual_queue import ManualItem
+from src.core.matcher import MatchScorer
+
+ACCEPT = 'accept'
+SKIP = 'skip'
+
+class ReviewRow:
+    """Строка проверки: файл, выбранный кандидат, его оценка и решение пользователя"""
+
+    __slots__ = ('position', 'item', 'track', 'score', 'decision')
+
+    def __init__(self, position: int, item: ManualItem, track: Optional[Dict], score: float):
+        self.position = position
+        self.item = item
+        self.track = track
+        self.score = score
+        self.decision: Optional[str] = None
+
+class ReviewTableModel(QAbstractTableModel):
+    """Модель таблицы файлов очереди ручного выбора с лучшим кандидатом и оценкой"""
+
+    COLUMNS = ("Файл", "Теги файла", "Кандидат Spotify", "Оценка", "Решение")
+    DECISION_LABELS = {ACCEPT: "Принять", SKIP: "Пропустить", None: ""}
+    DECISION_COLORS = {ACCEPT: QColor("#d4f5df"), SKIP: QColor("#f5d4d4")}
+
+    def __init__(self, items: List[ManualItem], matcher: Optional[MatchScorer] = None, parent=None):
+        super().__init__(parent)
+        self.matcher = matcher or MatchScorer()
+        # Все файлы очереди оцениваются одним пакетом
+        best = self.matcher.best_matches((item.metadata, item.candidates) for item in items)
+        self.rows: List[ReviewRow] = [
+            ReviewRow(position, item, track, score)
+            for position, (item, (track, score)) in enumerate(zip(items, best))
+        ]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return os.path.basename(row.item.path)
+            if column == 1:
+                title, artist = row.item.metadata[0], row.item.metadata[1]
+                return f"{artist} — {title}"
+            if column == 2:
+                if not row.track:
+                    return "Нет кандидатов"
+                artists = ", ".join(a['name'] for a in row.track.get('artists') or [])
+                return f"{artists} — {row.track['name']}"
+            if column == 3:
+                return f"{row.score:.0%}" if row.track else ""
+            if column == 4:
+                return self.DECISION_LABELS[row.decision]
+        elif role == Qt.ItemDataRole.ToolTipRole and column == 0:
+            return row.item.path
+        elif role == Qt.ItemDataRole.BackgroundRole:
+            return self.DECISION_COLORS.get(row.decision)
+        elif role == Qt.ItemDataRole.TextAlignmentRole and column == 3:
+            return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Сортирует строки по столбцу; по оценке - численно"""
+        keys = {
+            0: lambda row: os.path.basename(row.item.path).casefold(),
+            1: lambda row: f"{row.item.metadata[1]} {row.item.metadata[0]}".casefold(),
+            2: lambda row: row.track['name'].casefold() if row.track else "",
+            3: lambda row: row.score,
+            4: lambda row: row.decision or "",
+        }
+        self.layoutAboutToBeChanged.emit()
+        self.rows.sort(key=keys[column], reverse=order == Qt.SortOrder.DescendingOrder)
+        self.layoutChanged.emit()
+
+    def set_decision(self, rows: List[int], decision: Optional[str]) -> None:
+        """Отмечает строки решением; принять можно только строки с кандидатом"""
+        changed = []
+        for index in rows:
+            row = self.rows[index]
+            if decision == ACCEPT and not row.track:
+                continue
+            row.decision = decision
+            changed.append(index)
+        if changed:
+            self.dataChanged.emit(
+                self.index(min(changed), 0), self.index(max(changed), len(self.COLUMNS) - 1)
+            )
+
+    def set_track(self, index: int, track: Dict) -> None:
+        """Заменяет кандидата строки выбранным вручную треком и принимает его"""
+        row = self.rows[index]
+        row.track = track
+        row.score = self.matcher.score(row.item.metadata, track)
+        row.decision = ACCEPT
+        self.dataChanged.emit(self.index(index, 0), self.index(index, len(self.COLUMNS) - 1))
+
+    def decided(self, decision: Optional[str]) -> List[ReviewRow]:
+        """Строки с решением decision в исходном порядке очереди, независимо от сортировки таблицы"""
+        return sorted((row for row in self.rows if row.decision == decision), key=lambda row: row.position)
+
+class BulkReviewDialog(QDialog):
+    """Массовая проверка очереди ручного выбора
+
+    Таблица показывает все файлы очереди с лучшим кандидатом и оценкой.
+    Выделенные строки принимаются клавишей A или Enter, пропускаются клавишей
+    S или Delete, решение снимается клавишей U. Двойной щелчок открывает
+    обычный диалог выбора трека для строки. Результат - списки принятых
+    (файл, трек) и пропущенных файлов; файлы без решения остаются в очереди.
+    """
+
+    def __init__(self, items: List[ManualItem], spotify_client, parent=None):
+        super().__init__(parent)
+        self.spotify_client = spotify_client
+        self.model = ReviewTableModel(items, parent=self)
+
+        self.setWindowTitle("Проверка совпадений")
+        self.setMinimumSize(1000, 600)
+        self.setStyleSheet(DIALOG_STYLE)
+
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        hint = QLabel(
+            "A / Enter - принять выделенные, S / Delete - пропустить, U - снять решение, "
+            "двойной щелчок - выбрать другой трек"
+        )
+        hint.setStyleSheet("color: #666666;")
+        layout.addWidget(hint)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(3, Qt.SortOrder.DescendingOrder)
+        self.table.verticalHeader().hide()
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setStretchLastSection(True)
+        self.table.resizeColumnsToContents()
+        self.table.doubleClicked.connect(self.choose_track)
+        layout.addWidget(self.table)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        buttons_layout = QHBoxLayout()
+        accept_button = ModernButton("Принять (A)")
+        accept_button.clicked.connect(lambda: self.mark_selected(ACCEPT))
+        skip_button = ModernButton("Пропустить (S)", color="#ff6b6b")
+        skip_button.clicked.connect(lambda: self.mark_selected(SKIP))
+        apply_button = ModernButton("Применить")
+        apply_button.clicked.connect(self.accept)
+        cancel_button = ModernButton("Отмена", color="#666666")
+        cancel_button.clicked.connect(self.reject)
+        for button in (accept_button, skip_button):
+            buttons_layout.addWidget(button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(apply_button)
+        buttons_layout.addWidget(cancel_button)
+        layout.addLayout(buttons_layout)
+
+        # Горячие клавиши действуют на все выделенные строки
+        for keys, decision in ((("A", "Return", "Enter"), ACCEPT), (("S", "Delete"), SKIP), (("U", "Backspace"), None)):
+            for key in keys:
+                shortcut = QShortcut(QKeySequence(key), self.table)
+                shortcut.setContext(Qt.ShortcutContext.WidgetShortcut)
+                shortcut.activated.connect(lambda decision=decision: self.mark_selected(decision))
+
+        self.model.dataChanged.connect(self.update_summary)
+        self.update_summary()
+        if self.model.rowCount():
+            self.table.selectRow(0)
+        self.table.setFocus()
+
+    def selected_rows(self) -> List[int]:
+        return sorted(index.row() for index in self.table.selectionModel().selectedRows())
+
+    def mark_selected(self, decision: Optional[str]) -> None:
+        """Отмечает выделенные строки и переводит выделение на следующую строку"""
+        rows = self.selected_rows()
+        if not rows:
+            return
+        self.model.set_decision(rows, decision)
+        if len(rows) == 1 and rows[0] + 1 < self.model.rowCount():
+            self.table.selectRow(rows[0] + 1)
+
+    def choose_track(self, index: QModelIndex) -> None:
+        """Открывает диалог выбора трека для строки"""
+        row = self.model.rows[index.row()]
+        dialog = TrackSelectionDialog(row.item.candidates, row.item.metadata, self.spotify_client, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted and dialog.get_selected_track():
+            self.model.set_track(index.row(), dialog.get_selected_track())
+
+    def update_summary(self, *args) -> None:
+        accepted = len(self.model.decided(ACCEPT))
+        skipped = len(self.model.decided(SKIP))
+        undecided = self.model.rowCount() - accepted - skipped
+        self.summary_label.setText(
+            f"Принято: {accepted}, пропущено: {skipped}, без решения: {undecided}"
+        )
+
+    def get_accepted(self) -> List[Tuple[ManualItem, Dict]]:
+        """Принятые файлы с выбранными треками в порядке очереди"""
+        return [(row.item, row.track) for row in self.model.decided(ACCEPT)]
+
+    def get_skipped(self) -> List[ManualItem]:
+        return [row.item for row in self.model.decided(SKIP)]
+
+    def get_undecided(self) -> List[ManualItem]:
+        return [row.item for row in self.model.decided(None)]
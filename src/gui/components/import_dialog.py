@@ -1,13 +1,24 @@
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
     QLabel, QFileDialog, QProgressBar, QMessageBox,
-    QFrame, QLineEdit
+    QFrame, QLineEdit, QSpinBox, QCheckBox
 )
 from PyQt6.QtCore import Qt, pyqtSignal, QThread
 from src.core.spotify_client import SpotifyClient
 from src.core.track_processor import TrackProcessor
-from src.utils.logger import Logger
-from src.gui.components.track_selection_dialog import TrackSelectionDialog
+from src.core.search_pipeline import SearchPipeline, SearchRequest
+from src.core.playlist_writer import PlaylistWriter
+from src.core.request_scheduler import RequestCancelled
+from src.core.matcher import MatchScorer, strip_match_forms
+from src.core.manual_queue import ManualQueue
+from src.utils.logger import Logger, RunJournal, RunState
+from src.utils.settings import get_setting, save_settings
+from src.gui.components.track_selection_dialog import TrackSelectionDialog, prefetch_candidates
+from src.gui.components.bulk_review_dialog import BulkReviewDialog
+from typing import Optional
+import itertools
+import time
+from collections import Counter
 import os
 
 class ImportThread(QThread):
@@ -18,125 +29,377 @@ class ImportThread(QThread):
     queue_updated = pyqtSignal(int)
     playlist_created = pyqtSignal(str)
     
-    def __init__(self, directory: str, playlist_name: str, spotify_client):
+    def __init__(self, directory: str, playlist_name: str, spotify_client,
+                 max_in_flight: Optional[int] = None, market: Optional[str] = None,
+                 search_limit: Optional[int] = None, resume_state: Optional[RunState] = None):
         super().__init__()
         self.directory = directory
         self.playlist_name = playlist_name
         self.spotify_client = spotify_client
         self.is_running = False
-        self.manual_queue = []
+        self.manual_queue = ManualQueue(prefetch=prefetch_candidates)
         self.track_processor = TrackProcessor()
+        # Ошибки чтения тегов приходят из потока обработки и попадают в причину пропуска файла
+        self.tag_errors = {}
+        self.track_processor.error_occurred.connect(self._on_tag_error, Qt.ConnectionType.DirectConnection)
+        self.matcher = MatchScorer()
+        self.search_pipeline = SearchPipeline(spotify_client, max_in_flight, self.matcher, market, search_limit)
+        self.playlist_writer = None
+        self.match_stats = Counter()
         self.logger = Logger()
+        # Состояние прерванного запуска, который продолжается в тот же плейлист
+        self.resume_state = resume_state
+        self.resumed_count = 0
+        
+    def _search_jobs(self, audio_files):
+        """Готовит задания для конвейера поиска (ISRC и текстовый запрос); метаданные извлекаются параллельно по мере сканирования"""
+        for file_path, metadata, resolved_track, isrc in self.track_processor.iter_metadata(audio_files, lambda: self.is_running):
+            request = None
+            if not resolved_track:
+                query = None
+                if metadata and metadata[0] and metadata[1]:
+                    query = f"{metadata[0]} {metadata[1]}"
+                if query or isrc:
+                    request = SearchRequest(query, isrc, metadata)
+            yield (file_path, metadata, resolved_track), request
         
     def run(self):
+        # Запуск считается завершенным, только если обработка дошла до конца без отмены и ошибок
+        completed = failed = False
         try:
             self.is_running = True
+            self.spotify_client.scheduler.reset()
             self.status_updated.emit("Сканирование директории...")
             
-            audio_files = self.track_processor.get_audio_files(self.directory)
-            total_files = len(audio_files)
+            # Сканируем директорию в фоне: обработка начинается с первого найденного файла
+            audio_files = self.track_processor.scan_ahead(self.directory, lambda: self.is_running)
+            first_file = next(audio_files, None)
             
-            if total_files == 0:
+            if first_file is None:
+                self._finish_scan()
                 self.error_occurred.emit("Ошибка", "В выбранной директории нет аудио файлов")
                 return
+            audio_files = itertools.chain([first_file], audio_files)
             
             processed_count = 0
             spotify_tracks = []
             
-            # Создаем плейлист в Spotify
-            self.status_updated.emit("Создание плейлиста в Spotify...")
-            try:
-                playlist_id = self.spotify_client.create_playlist(
-                    self.playlist_name,
-                    description="Создано с помощью Spotify Merger"
-                )
+            if self.resume_state:
+                # Продолжаем прерванный импорт: треки дописываются в тот же плейлист
+                playlist_id = self.resume_state.playlist_id
                 self.playlist_created.emit(playlist_id)
-            except Exception as e:
-                self.error_occurred.emit("Ошибка Spotify", f"Не удалось создать плейлист: {str(e)}")
-                return
+                self.playlist_writer = PlaylistWriter(
+                    self.spotify_client, playlist_id, on_flush=self.logger.journal_playlist_write,
+                    existing=self.resume_state.uris
+                )
+            else:
+                # Создаем плейлист в Spotify
+                self.status_updated.emit("Создание плейлиста в Spotify...")
+                try:
+                    playlist_id = self.spotify_client.create_playlist(
+                        self.playlist_name,
+                        description="Создано с помощью Spotify Merger"
+                    )
+                    self.playlist_created.emit(playlist_id)
+                    self.playlist_writer = PlaylistWriter(
+                        self.spotify_client, playlist_id, on_flush=self.logger.journal_playlist_write
+                    )
+                except Exception as e:
+                    self.error_occurred.emit("Ошибка Spotify", f"Не удалось создать плейлист: {str(e)}")
+                    return
+            
+            # Очередь ручного выбора привязана к плейлисту и переживает перезапуск
+            self.manual_queue.open(playlist_id or self.directory)
+            if self.resume_state:
+                self._restore_state()
             
-            # Обрабатываем каждый файл
-            for file_path in audio_files:
+            self.logger.start_journal(
+                self.resume_state.path if self.resume_state else None,
+                mode='import', directory=self.directory,
+                playlist_name=self.playlist_name, playlist_id=playlist_id
+            )
+            
+            # Обрабатываем файлы: поиск идет параллельно, результаты приходят в порядке файлов
+            jobs = self._search_jobs(self._skip_resolved(audio_files))
+            for (file_path, metadata, resolved_track), search_future in self.search_pipeline.run(jobs, lambda: self.is_running):
                 if not self.is_running:
                     break
                 
-                self.status_updated.emit(f"Обработка: {os.path.basename(file_path)}")
+                # Запись журнала о файле: исход, стратегия и задержки этапов
+                record = RunJournal.new_file_record(file_path)
+                record['timings_ms'].update(self.track_processor.pop_timings(file_path))
+                pending_uri = None
+                
+                scan_info = "" if self.track_processor.scan_complete else ", сканирование продолжается"
+                self.status_updated.emit(
+                    f"Обработка: {os.path.basename(file_path)} "
+                    f"(найдено файлов: {self.track_processor.scanned_count}{scan_info})"
+                )
                 
                 try:
-                    metadata = self.track_processor.extract_metadata(file_path)
+                    tag_error = self.tag_errors.pop(file_path, None)
                     if not metadata:
-                        self.logger.log_missing(file_path, "Не удалось получить метаданные")
+                        self._log_missing(record, tag_error or "Не удалось получить метаданные")
                         continue
                     
                     title, artist, duration = metadata
+                    search_result = None if resolved_track else search_future.result()
                     
-                    if not title or not artist:
-                        self.logger.log_missing(file_path, "Отсутствует название или исполнитель в метаданных")
+                    # Файл без названия или исполнителя все еще можно сопоставить по ISRC
+                    isrc_hit = bool(search_result and search_result.strategy == 'isrc' and search_result.tracks)
+                    if (not title or not artist) and not resolved_track and not isrc_hit:
+                        self._log_missing(record, "Отсутствует название или исполнитель в метаданных")
                         continue
                     
-                    search_query = f"{title} {artist}"
-                    tracks, error = self.spotify_client.search_track(search_query)
-                    
-                    if error != "OK":
-                        self.logger.log_missing(file_path, f"Ошибка поиска: {error}")
-                        continue
-                        
-                    if not tracks:
-                        self.logger.log_missing(file_path, "Трек не найден в Spotify")
-                        continue
-                        
-                    # Проверяем точное совпадение
-                    exact_match = None
-                    for track in tracks:
-                        track_title = track['name'].lower()
-                        track_artist = track['artists'][0]['name'].lower()
+                    if resolved_track:
+                        # Файл не менялся с прошлого запуска, используем найденный ранее трек
+                        matched_track = resolved_track
+                        match_score = None
+                        self.match_stats['index'] += 1
+                        record['strategy'] = 'index'
+                    else:
+                        tracks, error = search_result.tracks, search_result.status
+                        record['strategy'] = search_result.strategy
+                        record['timings_ms']['search'] = search_result.elapsed_ms
                         
-                        if title.lower() == track_title and artist.lower() == track_artist:
-                            exact_match = track
-                            break
+                        if error != "OK":
+                            self._log_missing(record, f"Ошибка поиска: {error}", outcome='error')
+                            continue
+                            
+                        if not tracks:
+                            self._log_missing(record, "Трек не найден в Spotify")
+                            continue
+                            
+                        if search_result.strategy == 'isrc':
+                            # Совпадение по ISRC точное, нечеткое сравнение не требуется
+                            matched_track, match_score = tracks[0], None
+                            self.match_stats['isrc'] += 1
+                        else:
+                            # Оцениваем кандидатов и принимаем лучший, если уверенность достаточна
+                            match_started = time.perf_counter()
+                            best_track, match_score = self.matcher.best_match((title, artist, duration), tracks)
+                            matched_track = best_track if self.matcher.is_confident(match_score) else None
+                            record['timings_ms']['match'] = round((time.perf_counter() - match_started) * 1000, 2)
+                            self.match_stats['fuzzy' if matched_track else 'manual'] += 1
+                        record['score'] = match_score
+                        if matched_track:
+                            self.track_processor.remember_match(file_path, matched_track)
                         
-                    if exact_match:
+                    if matched_track:
                         track_details = {
                             'playlist': self.playlist_name,
                             'manual_selection': False,
                             'original_title': title,
-                            'original_artist': artist
+                            'original_artist': artist,
+                            'match_score': match_score,
+                            'match_strategy': 'index' if resolved_track else search_result.strategy
                         }
-                        spotify_tracks.append(exact_match['uri'])
-                        self.logger.log_track_processed(file_path, exact_match, track_details)
+                        spotify_tracks.append(matched_track['uri'])
+                        self.logger.log_track_processed(file_path, matched_track, track_details)
+                        record['outcome'] = 'added'
+                        record['uri'] = matched_track['uri']
                         
+                        if matched_track['uri'] in self.playlist_writer:
+                            record['outcome'] = 'duplicate'
+                        else:
+                            pending_uri = matched_track['uri']
                         try:
-                            self.spotify_client.add_tracks_to_playlist(playlist_id, [exact_match['uri']])
+                            self.playlist_writer.add(matched_track['uri'])
                         except Exception as e:
                             self.error_occurred.emit("Ошибка Spotify", f"Не удалось добавить трек в плейлист: {str(e)}")
                     else:
-                        self.manual_queue.append((file_path, (title, artist, duration), tracks))
+                        self.manual_queue.put(file_path, (title, artist, duration), tracks)
                         self.queue_updated.emit(len(self.manual_queue))
-                        self.logger.log_missing(file_path, "Требуется ручной выбор трека")
+                        record['metadata'] = [title, artist, duration]
+                        record['candidates'] = [strip_match_forms(track) for track in tracks]
+                        self._log_missing(record, "Требуется ручной выбор трека", outcome='manual')
                     
                 except Exception as e:
-                    self.logger.log_missing(file_path, f"Ошибка обработки: {str(e)}")
+                    self._log_missing(record, f"Ошибка обработки: {str(e)}", outcome='error')
+                finally:
+                    self.logger.journal_file(record, pending_uri)
+                
+                # Отправляем пакет треков, если он ждет дольше допустимого
+                self._flush_playlist(force=False)
                 
                 processed_count += 1
-                self.progress_updated.emit(int((processed_count / total_files) * 100))
+                # Общее число файлов растет, пока идет сканирование
+                done_count = processed_count + self.resumed_count
+                total_files = max(self.track_processor.scanned_count, done_count)
+                self.progress_updated.emit(int((done_count / total_files) * 100))
+            
+            completed = self.is_running
+            
+            # Отправляем оставшиеся треки, в том числе если обработка была отменена
+            self._flush_playlist()
+            self._finish_scan()
+            
+            self._log_match_stats(processed_count)
+            cache_stats = self.spotify_client.get_search_cache_stats() if self.spotify_client else None
+            if cache_stats:
+                self.logger.log_info(
+                    f"Кэш поиска: попаданий {cache_stats['hits']}, промахов {cache_stats['misses']} "
+                    f"({cache_stats['hit_rate']:.0%})"
+                )
+            if self.spotify_client:
+                for endpoint, stats in self.spotify_client.get_latency_stats().items():
+                    self.logger.log_info(
+                        f"{endpoint}: {stats['count']} запросов, "
+                        f"среднее {stats['avg_ms']:.0f} мс, максимум {stats['max_ms']:.0f} мс"
+                    )
+                scheduler = self.spotify_client.scheduler
+                self.logger.log_info(
+                    f"Ответов 429: {scheduler.throttled_count}, повторов запросов: {scheduler.retry_count}"
+                )
             
             self.status_updated.emit("Обработка завершена")
             self.finished.emit()
             
+        except RequestCancelled:
+            self.logger.log_info("Обработка отменена во время ожидания ответа Spotify")
         except Exception as e:
+            failed = True
             self.error_occurred.emit("Ошибка", f"Произошла ошибка при обработке: {str(e)}")
         finally:
+            self._flush_playlist()
+            # Файлы с неотправленными треками обработаются заново при продолжении
+            if self._report_unsent():
+                completed = False
+            self.track_processor.close()
+            self.logger.end_journal(
+                match_stats=dict(self.match_stats), search_stats=self.search_pipeline.get_stats(),
+                cancelled=not self.is_running and not failed, failed=failed, completed=completed and not failed
+            )
+            self.logger.flush()
             self.is_running = False
             
+    def cancel(self):
+        """Останавливает обработку и прерывает ожидание запросов к Spotify"""
+        self.is_running = False
+        self.spotify_client.scheduler.cancel()
+            
+    def _on_tag_error(self, file_path: str, error: str):
+        self.tag_errors[file_path] = error
+            
+    def _restore_state(self):
+        """Восстанавливает очередь ручного выбора и отправленные треки продолженного запуска"""
+        state = self.resume_state
+        for file_path, (metadata, candidates) in state.manual.items():
+            if len(metadata) == 3 and candidates:
+                self.manual_queue.put(file_path, metadata, candidates)
+        if self.manual_queue:
+            self.queue_updated.emit(len(self.manual_queue))
+        # Треки, уже записанные в output.txt прерванным запуском, не записываются повторно
+        self.logger.processed_track_ids.update(uri.rsplit(':', 1)[-1] for uri in state.uris)
+        self.logger.log_info(
+            f"Продолжение запуска: обработано файлов {len(state.resolved)}, "
+            f"в очереди ручного выбора {len(self.manual_queue)}"
+        )
+        
+    def _skip_resolved(self, audio_files):
+        """Пропускает файлы, решение по которым принято в прерванном запуске"""
+        skipped = set(self.resume_state.resolved) | set(self.resume_state.manual) if self.resume_state else set()
+        for file_path in audio_files:
+            if file_path in skipped:
+                self.resumed_count += 1
+                continue
+            yield file_path
+            
+    def _log_missing(self, record: dict, reason: str, outcome: str = 'missing'):
+        """Записывает пропущенный файл в missing.txt и отмечает исход в записи журнала"""
+        record['outcome'] = outcome
+        record['reason'] = reason
+        self.logger.log_missing(record['path'], reason)
+        
+    def _log_match_stats(self, processed_count: int):
+        """Записывает в лог, сколько файлов сопоставлено каждой стратегией"""
+        if not processed_count:
+            return
+        labels = (('index', 'индекс библиотеки'), ('isrc', 'ISRC'),
+                  ('fuzzy', 'нечеткий поиск'), ('manual', 'ручной выбор'))
+        self.logger.log_info("Сопоставление файлов: " + ", ".join(
+            f"{label} {self.match_stats[key]} ({self.match_stats[key] / processed_count:.0%})"
+            for key, label in labels
+        ))
+        search_stats = self.search_pipeline.get_stats()
+        duplicates = self.playlist_writer.duplicate_count if self.playlist_writer else 0
+        if search_stats.get('coalesced') or duplicates:
+            self.logger.log_info(
+                f"Повторные поиски объединены: {search_stats.get('coalesced', 0)}, "
+                f"повторные треки не добавлены в плейлист: {duplicates}"
+            )
+        if search_stats.get('isrc_requests'):
+            self.logger.log_info(
+                f"Поиск по ISRC: найдено {search_stats.get('isrc_hits', 0)} из {search_stats['isrc_requests']}"
+            )
+        stages = (('fielded', 'track:/artist:'), ('stripped', 'без remix/feat'), ('title', 'только название'),
+                  ('widened', 'расширенный поиск'))
+        if any(search_stats.get(f'{stage}_requests') for stage, _ in stages):
+            self.logger.log_info("Каскад запросов (уверенных совпадений / запросов): " + ", ".join(
+                f"{label} {search_stats.get(f'{stage}_hits', 0)}/{search_stats.get(f'{stage}_requests', 0)}"
+                for stage, label in stages
+            ))
+            
+    def _finish_scan(self):
+        """Очищает индекс от удаленных файлов, если директория была просканирована полностью"""
+        if self.track_processor.scan_complete:
+            self.track_processor.finish_scan(self.directory, self.track_processor.scanned_files)
+            
+    def _flush_playlist(self, force: bool = True):
+        """Отправляет накопленные треки в плейлист"""
+        if not self.playlist_writer:
+            return
+        try:
+            if force:
+                self.playlist_writer.flush()
+            else:
+                self.playlist_writer.tick()
+        except RequestCancelled:
+            # После отмены треки не отправляются; файлы будут отмечены ошибкой и обработаны при продолжении
+            pass
+        except Exception as e:
+            self.error_occurred.emit("Ошибка Spotify", f"Не удалось добавить треки в плейлист: {str(e)}")
+            
+    def _report_unsent(self) -> int:
+        """Отмечает ошибкой файлы, треки которых так и не удалось отправить в плейлист; возвращает их число"""
+        if not self.playlist_writer or not self.playlist_writer.pending:
+            return 0
+        uris = self.playlist_writer.drop_pending()
+        # Файлы уже записаны в output.txt при сопоставлении, поэтому ошибка отмечается и в missing.txt
+        file_paths = self.logger.journal_playlist_failed(uris)
+        for file_path in file_paths:
+            self.logger.log_missing(file_path, RunJournal.UNSENT_REASON)
+        return len(file_paths)
+            
+    def add_selected_track(self, uri: str) -> bool:
+        """Сразу добавляет выбранный вручную трек в плейлист; уже добавленный трек пропускается"""
+        if not self.playlist_writer:
+            return False
+        added = self.playlist_writer.add(uri)
+        self.playlist_writer.flush()
+        return added
+        
+    def add_selected_tracks(self, uris) -> int:
+        """Добавляет выбранные вручную треки в плейлист одной пакетной записью; возвращает число новых треков"""
+        if not self.playlist_writer:
+            return 0
+        added = sum(1 for uri in uris if self.playlist_writer.add(uri))
+        self.playlist_writer.flush()
+        return added
+        
     def get_manual_queue_size(self):
         return len(self.manual_queue)
         
     def get_next_manual_track(self):
-        if self.manual_queue:
-            track = self.manual_queue.pop(0)
+        item = self.manual_queue.get()
+        if item:
             self.queue_updated.emit(len(self.manual_queue))
-            return track
-        return None
+        return item
+        
+    def resolve_manual_track(self, file_path: str, uri: Optional[str] = None):
+        """Отмечает файл из очереди ручного выбора разрешенным: выбран трек uri или файл пропущен"""
+        self.manual_queue.resolve(file_path)
+        self.logger.journal_resolution(file_path, uri)
 
 class ModernButton(QPushButton):
     def __init__(self, text, parent=None):
@@ -201,6 +464,9 @@ class ImportDialog(QDialog):
         self.import_thread = None
         self.selected_directory = None
         self.playlist_id = None
+        self.resume_state = None
+        self.resolving = False
+        self.import_done = False
         self.setup_ui()
         
     def setup_ui(self):
@@ -225,6 +491,18 @@ class ImportDialog(QDialog):
             QLineEdit:focus {
                 border: 1px solid #1DB954;
             }
+            QCheckBox {
+                color: #FFFFFF;
+            }
+            QSpinBox {
+                padding: 8px 12px;
+                border: 1px solid #282828;
+                border-radius: 4px;
+                background-color: #282828;
+                color: #FFFFFF;
+                font-size: 13px;
+                min-height: 20px;
+            }
         """)
         
         layout = QVBoxLayout(self)
@@ -274,6 +552,28 @@ class ImportDialog(QDialog):
         self.playlist_name_edit.setPlaceholderText("Название плейлиста")
         main_layout.addWidget(self.playlist_name_edit)
         
+        # Продолжение прерванного импорта той же папки в тот же плейлист
+        self.resume_checkbox = QCheckBox("Продолжить прерванный импорт")
+        self.resume_checkbox.setEnabled(False)
+        self.resume_checkbox.toggled.connect(self.playlist_name_edit.setDisabled)
+        main_layout.addWidget(self.resume_checkbox)
+        
+        # Параметры поиска: рынок и число результатов на запрос
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(QLabel("Рынок:"))
+        self.market_edit = QLineEdit(get_setting('search_market'))
+        self.market_edit.setMaxLength(2)
+        self.market_edit.setPlaceholderText("TR")
+        self.market_edit.setToolTip("Код страны, в каталоге которой ищутся треки")
+        search_layout.addWidget(self.market_edit)
+        search_layout.addWidget(QLabel("Результатов:"))
+        self.search_limit_spin = QSpinBox()
+        self.search_limit_spin.setRange(1, SpotifyClient.MAX_SEARCH_LIMIT)
+        self.search_limit_spin.setValue(int(get_setting('search_limit')))
+        self.search_limit_spin.setToolTip("Число результатов в одном поисковом запросе")
+        search_layout.addWidget(self.search_limit_spin)
+        main_layout.addLayout(search_layout)
+        
         # Прогресс
         self.status_label = QLabel("Готов к импорту")
         self.status_label.setStyleSheet("color: #B3B3B3;")
@@ -292,11 +592,22 @@ class ImportDialog(QDialog):
         self.start_button.clicked.connect(self.start_import)
         self.start_button.setEnabled(False)
         
+        # Очередь ручного выбора можно разбирать, пока импорт продолжается
+        self.resolve_button = ModernButton("Разрешить конфликты")
+        self.resolve_button.clicked.connect(self.process_manual_queue)
+        self.resolve_button.hide()
+        
+        self.review_button = ModernButton("Проверить списком")
+        self.review_button.clicked.connect(self.review_manual_queue)
+        self.review_button.hide()
+        
         self.cancel_button = ModernButton("Отмена")
         self.cancel_button.setProperty("class", "secondary")
         self.cancel_button.clicked.connect(self.reject)
         
         buttons_layout.addWidget(self.start_button)
+        buttons_layout.addWidget(self.resolve_button)
+        buttons_layout.addWidget(self.review_button)
         buttons_layout.addWidget(self.cancel_button)
         
         layout.addLayout(buttons_layout)
@@ -307,24 +618,55 @@ class ImportDialog(QDialog):
             self.selected_directory = directory
             self.directory_label.setText(f"Выбрана директория: {directory}")
             self.start_button.setEnabled(True)
+            self.update_resume_option()
+            
+    def update_resume_option(self):
+        """Предлагает продолжить последний прерванный импорт выбранной директории"""
+        self.resume_state = Logger().find_resumable_run(self.selected_directory)
+        state = self.resume_state
+        self.resume_checkbox.setEnabled(state is not None)
+        self.resume_checkbox.setChecked(state is not None)
+        if state:
+            self.resume_checkbox.setText(
+                f"Продолжить импорт в плейлист «{state.playlist_name}» "
+                f"(обработано {len(state.resolved)}, ждут выбора {len(state.manual)})"
+            )
+        else:
+            self.resume_checkbox.setText("Продолжить прерванный импорт")
             
     def start_import(self):
         if not self.selected_directory:
             self.show_error("Ошибка", "Выберите директорию с музыкой")
             return
             
-        if not self.playlist_name_edit.text().strip():
+        resume_state = self.resume_state if self.resume_checkbox.isChecked() else None
+        if resume_state:
+            playlist_name = resume_state.playlist_name or self.playlist_name_edit.text().strip()
+        else:
+            playlist_name = self.playlist_name_edit.text().strip()
+        if not playlist_name:
             self.show_error("Ошибка", "Введите название плейлиста")
             return
             
+        market = self.market_edit.text().strip().upper()
+        if len(market) != 2 or not market.isalpha():
+            self.show_error("Ошибка", "Укажите рынок двухбуквенным кодом страны, например TR")
+            return
+        search_limit = self.search_limit_spin.value()
+        save_settings({'search_market': market, 'search_limit': search_limit})
+            
         self.start_button.setEnabled(False)
+        self.import_done = False
         self.progress_bar.show()
         self.progress_bar.setValue(0)
         
         self.import_thread = ImportThread(
             self.selected_directory,
-            self.playlist_name_edit.text().strip(),
-            self.spotify_client
+            playlist_name,
+            self.spotify_client,
+            market=market,
+            search_limit=search_limit,
+            resume_state=resume_state
         )
         
         self.import_thread.progress_updated.connect(self.progress_bar.setValue)
@@ -341,6 +683,10 @@ class ImportDialog(QDialog):
         self.reset_ui()
         
     def import_finished(self):
+        self.import_done = True
+        if self.resolving:
+            # Очередь уже разбирается: итог покажет process_manual_queue
+            return
         if self.import_thread and self.import_thread.get_manual_queue_size() > 0:
             self.process_manual_queue()
         else:
@@ -354,6 +700,9 @@ class ImportDialog(QDialog):
         self.status_label.setText("Готов к импорту")
         
     def handle_queue_update(self, queue_size: int):
+        self.resolve_button.setVisible(queue_size > 0)
+        self.review_button.setVisible(queue_size > 0)
+        self.resolve_button.setText(f"Разрешить конфликты ({queue_size})")
         if queue_size > 0:
             self.status_label.setText(f"Требуется разрешить {queue_size} конфликтов")
             
@@ -361,46 +710,121 @@ class ImportDialog(QDialog):
         self.playlist_id = playlist_id
         
     def process_manual_queue(self):
-        if not self.import_thread:
+        """Разбирает очередь ручного выбора; очередь можно разбирать, не дожидаясь конца импорта"""
+        if not self.import_thread or self.resolving:
             return
             
-        next_track = self.import_thread.get_next_manual_track()
-        if next_track:
-            file_path, metadata, tracks = next_track
-            dialog = TrackSelectionDialog(tracks, metadata, self.spotify_client, self)
-            result = dialog.exec()
-            
-            if result == QDialog.DialogCode.Accepted:
-                selected_track = dialog.get_selected_track()
-                if selected_track:
-                    try:
-                        self.spotify_client.add_tracks_to_playlist(self.playlist_id, [selected_track['uri']])
-                        track_details = {
-                            'playlist': self.playlist_name_edit.text().strip(),
-                            'manual_selection': True,
-                            'original_title': metadata[0],
-                            'original_artist': metadata[1]
-                        }
-                        self.import_thread.logger.log_track_processed(file_path, selected_track, track_details)
-                    except Exception as e:
-                        self.show_error("Ошибка Spotify", f"Не удалось добавить трек в плейлист: {str(e)}")
+        self.resolving = True
+        try:
+            while True:
+                next_track = self.import_thread.get_next_manual_track()
+                if next_track is None:
+                    break
+                file_path, metadata, tracks = next_track
+                dialog = TrackSelectionDialog(tracks, metadata, self.spotify_client, self)
+                result = dialog.exec()
+                
+                if result == QDialog.DialogCode.Accepted:
+                    selected_track = dialog.get_selected_track()
+                    if selected_track:
+                        try:
+                            self.import_thread.add_selected_track(selected_track['uri'])
+                            self.import_thread.resolve_manual_track(file_path, selected_track['uri'])
+                            self.import_thread.track_processor.remember_match(file_path, selected_track, flush=True)
+                            track_details = {
+                                'playlist': self.import_thread.playlist_name,
+                                'manual_selection': True,
+                                'original_title': metadata[0],
+                                'original_artist': metadata[1]
+                            }
+                            self.import_thread.logger.log_track_processed(file_path, selected_track, track_details)
+                        except Exception as e:
+                            self.show_error("Ошибка Spotify", f"Не удалось добавить трек в плейлист: {str(e)}")
+                            # Файл остается в очереди: трек ждет в буфере и уйдет при следующем выборе
+                            self.import_thread.manual_queue.requeue([next_track])
+                            self.handle_queue_update(self.import_thread.get_manual_queue_size())
+                            break
+                    else:
+                        self.import_thread.logger.log_missing(file_path, "Пропущен пользователем (нет выбранного трека)")
+                        self.import_thread.resolve_manual_track(file_path)
                 else:
-                    self.import_thread.logger.log_missing(file_path, "Пропущен пользователем (нет выбранного трека)")
-            else:
-                self.import_thread.logger.log_missing(file_path, "Пропущен пользователем")
+                    self.import_thread.logger.log_missing(file_path, "Пропущен пользователем")
+                    self.import_thread.resolve_manual_track(file_path)
+        finally:
+            self.resolving = False
             
-            remaining = self.import_thread.get_manual_queue_size()
-            if remaining > 0:
-                self.process_manual_queue()
-            else:
-                QMessageBox.information(self, "Готово", "Импорт успешно завершен!")
-                self.accept()
+        self._finish_resolving()
+        
+    def review_manual_queue(self):
+        """Массовая проверка очереди ручного выбора; принятые треки добавляются одной пакетной записью"""
+        if not self.import_thread or self.resolving:
+            return
+        queue = self.import_thread.manual_queue
+        items = queue.take_all()
+        if not items:
+            return
+            
+        self.resolving = True
+        try:
+            dialog = BulkReviewDialog(items, self.spotify_client, self)
+            if dialog.exec() != QDialog.DialogCode.Accepted:
+                queue.requeue(items)
+                return
+            # Файлы без решения возвращаются в очередь
+            queue.requeue(dialog.get_undecided())
+            
+            accepted = dialog.get_accepted()
+            try:
+                self.import_thread.add_selected_tracks([track['uri'] for _, track in accepted])
+            except Exception as e:
+                self.show_error("Ошибка Spotify", f"Не удалось добавить треки в плейлист: {str(e)}")
+                queue.requeue([item for item, _ in accepted])
+                accepted = []
+                
+            for index, (item, track) in enumerate(accepted):
+                self.import_thread.resolve_manual_track(item.path, track['uri'])
+                self.import_thread.track_processor.remember_match(
+                    item.path, track, flush=index == len(accepted) - 1
+                )
+                track_details = {
+                    'playlist': self.import_thread.playlist_name,
+                    'manual_selection': True,
+                    'original_title': item.metadata[0],
+                    'original_artist': item.metadata[1]
+                }
+                self.import_thread.logger.log_track_processed(item.path, track, track_details)
+            for item in dialog.get_skipped():
+                self.import_thread.logger.log_missing(item.path, "Пропущен пользователем")
+                self.import_thread.resolve_manual_track(item.path)
+        finally:
+            self.resolving = False
+            self.handle_queue_update(self.import_thread.get_manual_queue_size())
+            
+        self._finish_resolving()
+        
+    def _finish_resolving(self):
+        """Завершает импорт, если обработка закончена и очередь ручного выбора пуста"""
+        if self.import_thread.get_manual_queue_size() > 0:
+            return
+        if self.import_done:
+            QMessageBox.information(self, "Готово", "Импорт успешно завершен!")
+            self.accept()
+        else:
+            self.status_label.setText("Конфликты разрешены, импорт продолжается")
         
     def show_error(self, title: str, message: str):
         QMessageBox.critical(self, title, message)
         
-    def closeEvent(self, event):
+    def stop_import(self):
+        """Отменяет идущий импорт и дожидается остановки потока"""
         if self.import_thread and self.import_thread.is_running:
-            self.import_thread.is_running = False
+            self.import_thread.cancel()
             self.import_thread.wait()
+            
+    def reject(self):
+        self.stop_import()
+        super().reject()
+        
+    def closeEvent(self, event):
+        self.stop_import()
         event.accept() 
\ No newline at end of file
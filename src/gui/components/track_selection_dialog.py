@@ -4,14 +4,79 @@ from PyQt6.QtWidgets import (
     QLineEdit, QWidget, QFrame, QScrollArea,
     QMessageBox
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QSize, QThread, QTimer
+from PyQt6.QtCore import Qt, pyqtSignal, QSize, QThread
 from PyQt6.QtGui import QPixmap, QKeySequence, QShortcut, QFont
 import requests
 from io import BytesIO
 from src.gui.styles.modern_style import DIALOG_STYLE, BUTTON_STYLE
+from src.core.matcher import MatchScorer
 from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 import threading
 
+def cover_url(track):
+    """Возвращает адрес обложки альбома трека или None"""
+    images = (track.get('album') or {}).get('images') or [{}]
+    return images[0].get('url')
+
+class CoverCache:
+    """Кэш обложек альбомов с фоновой предзагрузкой
+
+    Обложки кандидатов для ближайших файлов очереди ручного выбора
+    загружаются заранее, поэтому диалог выбора показывает их сразу.
+    """
+
+    MAX_ENTRIES = 512
+    
+    def __init__(self, workers: int = 4):
+        self._images = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cover-prefetch")
+        
+    def _download(self, url):
+        try:
+            data = requests.get(url, timeout=5).content
+            with self._lock:
+                self._images[url] = data
+                while len(self._images) > self.MAX_ENTRIES:
+                    self._images.popitem(last=False)
+            return data
+        finally:
+            with self._lock:
+                self._loading.pop(url, None)
+        
+    def _request(self, url) -> Future:
+        with self._lock:
+            data = self._images.get(url)
+            if data is not None:
+                self._images.move_to_end(url)
+                future = Future()
+                future.set_result(data)
+                return future
+            future = self._loading.get(url)
+            if future is None:
+                future = self._loading[url] = self._executor.submit(self._download, url)
+            return future
+        
+    def prefetch(self, tracks):
+        """Начинает фоновую загрузку обложек треков"""
+        for track in tracks:
+            url = cover_url(track)
+            if url:
+                self._request(url)
+                
+    def get(self, url) -> bytes:
+        """Возвращает обложку, дожидаясь загрузки, если она еще идет"""
+        return self._request(url).result()
+
+cover_cache = CoverCache()
+
+def prefetch_candidates(item):
+    """Заранее загружает обложки кандидатов файла из очереди ручного выбора"""
+    cover_cache.prefetch(item.candidates)
+
 class ImageLoader(QThread):
     image_loaded = pyqtSignal(str, QPixmap)
     
@@ -21,8 +86,7 @@ class ImageLoader(QThread):
         
     def run(self):
         try:
-            response = requests.get(self.url, timeout=5)
-            image_data = BytesIO(response.content)
+            image_data = BytesIO(cover_cache.get(self.url))
             pixmap = QPixmap()
             pixmap.loadFromData(image_data.getvalue())
             scaled_pixmap = pixmap.scaled(50, 50, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
@@ -31,7 +95,7 @@ class ImageLoader(QThread):
             print(f"Error loading image: {e}")
 
 class TrackItemWidget(QWidget):
-    def __init__(self, track, metadata=None, parent=None):
+    def __init__(self, track, metadata=None, parent=None, matcher=None):
         super().__init__(parent)
         layout = QHBoxLayout(self)
         layout.setContentsMargins(5, 5, 5, 5)
@@ -43,9 +107,9 @@ class TrackItemWidget(QWidget):
         layout.addWidget(self.cover_label)
         
         # Загружаем обложку асинхронно
-        cover_url = track.get('album', {}).get('images', [{}])[0].get('url')
-        if cover_url:
-            self.loader = ImageLoader(cover_url)
+        url = cover_url(track)
+        if url:
+            self.loader = ImageLoader(url)
             self.loader.image_loaded.connect(self._set_image)
             self.loader.start()
         else:
@@ -62,16 +126,16 @@ class TrackItemWidget(QWidget):
         duration_style = ""
         
         if metadata:
-            orig_title, orig_artist, orig_duration = metadata
+            matcher = matcher or MatchScorer()
+            result = matcher.compare(metadata, track)
             # Проверяем совпадение названия
-            if orig_title.lower() in track['name'].lower() or track['name'].lower() in orig_title.lower():
+            if matcher.is_field_match(result.title):
                 title_style = "color: #1DB954; font-weight: bold;"
             # Проверяем совпадение исполнителя
-            if orig_artist.lower() in track['artists'][0]['name'].lower() or track['artists'][0]['name'].lower() in orig_artist.lower():
+            if matcher.is_field_match(result.artist):
                 artist_style = "color: #1DB954; font-weight: bold;"
             # Проверяем совпадение длительности (с погрешностью в 2 секунды)
-            track_duration = track['duration_ms'] / 1000
-            if abs(track_duration - orig_duration) <= 2:
+            if matcher.is_duration_match(metadata, track):
                 duration_style = "color: #1DB954; font-weight: bold;"
         
         title_label = QLabel(track['name'])
@@ -123,6 +187,7 @@ class TrackSelectionDialog(QDialog):
         super().__init__(parent)
         self.tracks = tracks
         self.metadata = metadata
+        self.matcher = MatchScorer()
         self.spotify_client = spotify_client
         self.selected_track = None
         self.search_mode = False
@@ -351,7 +416,7 @@ class TrackSelectionDialog(QDialog):
         for i in range(self.tracks_list.count()):
             item = self.tracks_list.item(i)
             track = item.data(Qt.ItemDataRole.UserRole)
-            score = calculate_track_similarity(track, self.metadata)
+            score = self.matcher.score(self.metadata, track)
             
             if score > best_score:
                 best_score = score
@@ -373,14 +438,12 @@ class TrackSelectionDialog(QDialog):
         if selected_track:
             self.selected_track = selected_track
             super().accept()
-            # Эмитим сигнал о том, что можно открывать следующий диалог
-            QTimer.singleShot(100, lambda: self.parent().process_manual_queue() if self.parent() else None)
             
     def update_tracks_list(self):
         self.tracks_list.clear()
         for track in self.tracks:
             item = QListWidgetItem(self.tracks_list)
-            track_widget = TrackItemWidget(track, self.metadata)
+            track_widget = TrackItemWidget(track, self.metadata, matcher=self.matcher)
             item.setSizeHint(track_widget.sizeHint())
             self.tracks_list.addItem(item)
             self.tracks_list.setItemWidget(item, track_widget)
@@ -442,23 +505,3 @@ class TrackSelectionDialog(QDialog):
             self.update_tracks_list()
         else:
             QMessageBox.warning(self, "Ошибка", f"Не удалось получить трек: {error}")
-
-def calculate_track_similarity(track, metadata):
-    """Вычисляет схожесть трека с оригинальными метаданными"""
-    score = 0
-    title, artist, duration = metadata
-    
-    # Проверяем название
-    if title.lower() in track['name'].lower() or track['name'].lower() in title.lower():
-        score += 1
-    
-    # Проверяем исполнителя
-    if artist.lower() in track['artists'][0]['name'].lower() or track['artists'][0]['name'].lower() in artist.lower():
-        score += 1
-    
-    # Проверяем длительность
-    track_duration = track['duration_ms'] / 1000
-    if abs(track_duration - duration) <= 2:
-        score += 1
-    
-    return score 
\ No newline at end of file
@@ -0,0 +1,44 @@
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Deque, Iterable, Iterator, Optional, Tuple
+
+def ordered_map(executor: Executor, func: Callable[[Any], Any], items: Iterable[Any],
+                max_in_flight: int, is_running: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[Any, Future]]:
+    """Выполняет func над элементами в пуле, выдавая пары (элемент, future) в исходном порядке
+
+    Одновременно в работе находится не более max_in_flight задач. Элементы читаются
+    из items лениво, поэтому источник может быть генератором. Если is_running
+    вернул False, подача новых задач прекращается, а ожидающие задачи отменяются.
+    """
+    pending: Deque[Tuple[Any, Future]] = deque()
+    iterator = iter(items)
+    exhausted = False
+    max_in_flight = max(1, max_in_flight)
+
+    try:
+        while True:
+            if is_running is not None and not is_running():
+                break
+
+            # Дозаполняем окно задач
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append((item, executor.submit(func, item)))
+
+            if not pending:
+                break
+
+            item, future = pending.popleft()
+            # Ждем результат первой по порядку задачи, остальные выполняются параллельно
+            try:
+                future.result()
+            except Exception:
+                pass
+            yield item, future
+    finally:
+        for _, future in pending:
+            future.cancel()
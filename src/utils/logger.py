@@ -1,8 +1,243 @@
 import logging
 from datetime import datetime
-from typing import Optional, Dict, List
+from typing import Any, NamedTuple, Optional, Dict, List, Set, Tuple
 import os
 import json
+import time
+import queue
+import atexit
+import threading
+
+class BufferedFileWriter:
+    """Фоновая дозапись текста в файлы
+
+    Строки ставятся в очередь и записываются отдельным потоком пакетами: каждый
+    файл открывается один раз на пакет, а не на каждую запись. Пакет
+    записывается, когда в нем набирается MAX_BATCH записей или с момента
+    предыдущей записи прошло flush_interval секунд, а также при вызове flush
+    и при завершении программы.
+    """
+
+    MAX_BATCH = 500
+
+    def __init__(self, flush_interval: float = 1.0, error_logger: Optional[logging.Logger] = None):
+        self.flush_interval = flush_interval
+        self.error_logger = error_logger or logging.getLogger(__name__)
+        self._queue: queue.Queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, path: str, text: str) -> None:
+        """Ставит текст в очередь на дозапись в файл"""
+        if self._closed:
+            self._write_batch([(path, text)])
+            return
+        self._queue.put((path, text))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Дожидается записи всего, что было поставлено в очередь до вызова"""
+        if self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self) -> None:
+        """Записывает остаток очереди и останавливает поток записи"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self) -> None:
+        batch: List[Tuple[str, str]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = False
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if len(batch) < self.MAX_BATCH and time.monotonic() < deadline:
+                    continue
+
+            # Пакет заполнен, истек интервал, запрошен сброс или завершение
+            self._write_batch(batch)
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+    def _write_batch(self, batch: List[Tuple[str, str]]) -> None:
+        """Дописывает пакет, открывая каждый файл один раз с сохранением порядка записей"""
+        chunks: Dict[str, List[str]] = {}
+        for path, text in batch:
+            chunks.setdefault(path, []).append(text)
+        for path, texts in chunks.items():
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(texts))
+            except Exception as e:
+                self.error_logger.error(f"Ошибка при записи в {os.path.basename(path)}: {e}")
+
+class RunState(NamedTuple):
+    """Состояние запуска, восстановленное из журнала
+
+    resolved - файлы, решение по которым уже принято (трек добавлен, не найден
+    или пропущен пользователем), uris - треки, уже отправленные в плейлист,
+    manual - очередь ручного выбора: путь -> (метаданные, кандидаты) в порядке
+    постановки. complete равен True, только если запуск дошел до конца без
+    отмены и ошибок; отмененный, упавший или оборванный запуск можно продолжить.
+    """
+    path: str
+    directory: Optional[str]
+    playlist_name: Optional[str]
+    playlist_id: Optional[str]
+    resolved: Set[str]
+    uris: Set[str]
+    manual: Dict[str, Tuple[Tuple, List[Dict[str, Any]]]]
+    complete: bool
+
+class RunJournal:
+    """Машиночитаемый журнал запуска в формате JSON Lines
+
+    Первая запись описывает запуск, далее по одной записи на файл с исходом,
+    стратегией сопоставления и задержками этапов в миллисекундах, затем итоги.
+    Запись о файле, трек которого ждет отправки в плейлист, откладывается
+    до отправки пакета, чтобы в нее попало время записи в плейлист. Решения
+    ручного выбора дописываются и после итогов. Продолженный запуск дописывает
+    журнал прерванного, поэтому load_state восстанавливает всю цепочку запусков.
+    """
+
+    STAGES = ('scan', 'tag_read', 'search', 'match', 'playlist_write')
+
+    # Исходы, после которых файл не обрабатывается повторно при продолжении запуска
+    RESOLVED_OUTCOMES = ('added', 'duplicate', 'missing', 'skipped')
+
+    # Причина ошибки для файлов, трек которых так и не удалось отправить в плейлист
+    UNSENT_REASON = "Трек не отправлен в плейлист"
+
+    def __init__(self, path: str, writer: BufferedFileWriter):
+        self.path = path
+        self.writer = writer
+        self.closed = False
+        self._pending: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_file_record(file_path: str) -> Dict:
+        """Создает пустую запись о файле"""
+        return {
+            'type': 'file',
+            'path': file_path,
+            'outcome': None,
+            'strategy': None,
+            'score': None,
+            'uri': None,
+            'timings_ms': dict.fromkeys(RunJournal.STAGES),
+        }
+
+    def write(self, record: Dict) -> None:
+        """Ставит запись в очередь на запись в журнал"""
+        record.setdefault('time', datetime.now().isoformat(timespec='milliseconds'))
+        self.writer.write(self.path, json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_file(self, record: Dict, pending_uri: Optional[str] = None) -> None:
+        """Записывает запись о файле или откладывает ее до отправки трека в плейлист"""
+        record['time'] = datetime.now().isoformat(timespec='milliseconds')
+        if pending_uri:
+            with self._lock:
+                self._pending.setdefault(pending_uri, []).append(record)
+            return
+        self.write(record)
+
+    def playlist_written(self, uris: List[str], elapsed: float) -> None:
+        """Дописывает отложенные записи после отправки пакета треков в плейлист"""
+        with self._lock:
+            records = [record for uri in uris for record in self._pending.pop(uri, [])]
+        for record in records:
+            record['timings_ms']['playlist_write'] = round(elapsed * 1000, 2)
+            self.write(record)
+
+    def playlist_failed(self, uris: List[str]) -> List[str]:
+        """Записывает отложенные записи треков uris с ошибкой и возвращает пути их файлов"""
+        with self._lock:
+            records = [record for uri in uris for record in self._pending.pop(uri, [])]
+        for record in records:
+            # При продолжении запуска такие файлы обработаются заново
+            record['outcome'] = 'error'
+            record['reason'] = self.UNSENT_REASON
+            self.write(record)
+        return [record['path'] for record in records]
+
+    def write_resolution(self, file_path: str, uri: Optional[str] = None) -> None:
+        """Записывает решение ручного выбора: выбранный трек или пропуск файла"""
+        self.write({
+            'type': 'resolution',
+            'path': file_path,
+            'outcome': 'added' if uri else 'skipped',
+            'uri': uri,
+        })
+
+    def close(self, **summary) -> None:
+        """Записывает оставшиеся отложенные записи и итоги запуска"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            records = [record for pending in self._pending.values() for record in pending]
+            self._pending.clear()
+        for record in records:
+            # Пакет с этими треками не удалось отправить: при продолжении файлы обработаются заново
+            record['outcome'] = 'error'
+            record['reason'] = self.UNSENT_REASON
+            self.write(record)
+        self.write({'type': 'summary', **summary})
+        self.writer.flush()
+
+    @classmethod
+    def load_state(cls, path: str) -> RunState:
+        """Восстанавливает состояние запуска из журнала; оборванная последняя строка пропускается"""
+        header: Dict = {}
+        resolved: Set[str] = set()
+        uris: Set[str] = set()
+        manual: Dict[str, Tuple[Tuple, List[Dict[str, Any]]]] = {}
+        complete = False
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                kind = record.get('type')
+                if kind == 'run':
+                    header = header or record
+                    complete = False
+                elif kind == 'summary':
+                    # В журналах прежних версий нет признака completed - только cancelled
+                    complete = bool(record.get('completed', not record.get('cancelled'))) and not record.get('failed')
+                elif kind in ('file', 'resolution'):
+                    file_path, outcome = record.get('path'), record.get('outcome')
+                    manual.pop(file_path, None)
+                    resolved.discard(file_path)
+                    if outcome == 'manual':
+                        metadata = tuple(record.get('metadata') or ())
+                        manual[file_path] = (metadata, record.get('candidates') or [])
+                    elif outcome in cls.RESOLVED_OUTCOMES:
+                        resolved.add(file_path)
+                    if outcome == 'added' and record.get('uri'):
+                        uris.add(record['uri'])
+        return RunState(
+            path, header.get('directory'), header.get('playlist_name'), header.get('playlist_id'),
+            resolved, uris, manual, complete
+        )
 
 class Logger:
     _instance = None
@@ -52,6 +287,10 @@ class Logger:
         self.tracks_list: List[Dict] = []
         self.processed_track_ids = set()  # Для отслеживания уже добавленных треков
         
+        # Файлы output.txt и missing.txt дописываются в фоне пакетами
+        self.writer = BufferedFileWriter(error_logger=self.logger)
+        self.journal: Optional[RunJournal] = None
+        
         self._initialized = True
         
     def log_track_processed(self, file_path: str, track_info: dict, details: dict = None):
@@ -78,19 +317,91 @@ class Logger:
         self.tracks_list.append(track_data)
         
         # Записываем в output.txt
-        try:
-            with open(self.output_file, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"[{timestamp}] Обработан файл: {os.path.basename(file_path)}\n")
-                f.write(f"  Оригинал: {details.get('original_title', '')} - {details.get('original_artist', '')}\n")
-                f.write(f"  Spotify: {track_info['name']} - {track_info['artists'][0]['name']}\n")
-                f.write(f"  ID: {track_info['id']}\n")
-                if details.get('manual_selection'):
-                    f.write("  (Выбрано вручную)\n")
-                f.write("\n")
-        except Exception as e:
-            self.logger.error(f"Ошибка при записи в output.txt: {e}")
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        lines = [
+            f"[{timestamp}] Обработан файл: {os.path.basename(file_path)}\n",
+            f"  Оригинал: {details.get('original_title', '')} - {details.get('original_artist', '')}\n",
+            f"  Spotify: {track_info['name']} - {track_info['artists'][0]['name']}\n",
+            f"  ID: {track_info['id']}\n",
+        ]
+        if details.get('manual_selection'):
+            lines.append("  (Выбрано вручную)\n")
+        elif details.get('match_score') is not None:
+            lines.append(f"  Уверенность: {details['match_score']:.2f}\n")
+        lines.append("\n")
+        self.writer.write(self.output_file, ''.join(lines))
+            
+    def start_journal(self, path: Optional[str] = None, **run_info) -> str:
+        """Начинает журнал нового запуска и возвращает путь к файлу журнала
+
+        Если передан path, запись продолжается в журнал прерванного запуска.
+        """
+        if self.journal:
+            self.end_journal(interrupted=True, completed=False)
+        resumed = path is not None
+        if not resumed:
+            path = os.path.join(self.log_dir, f"journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        self.journal = RunJournal(path, self.writer)
+        self.journal.write({'type': 'run', 'resumed': resumed, **run_info})
+        return path
+        
+    def journal_file(self, record: Dict, pending_uri: Optional[str] = None):
+        """Добавляет в журнал запись о файле; pending_uri откладывает ее до отправки трека в плейлист"""
+        if self.journal:
+            self.journal.write_file(record, pending_uri)
+            
+    def journal_playlist_write(self, uris: List[str], elapsed: float):
+        """Сообщает журналу об отправке пакета треков в плейлист"""
+        if self.journal:
+            self.journal.playlist_written(uris, elapsed)
+            
+    def journal_playlist_failed(self, uris: List[str]) -> List[str]:
+        """Отмечает в журнале ошибкой файлы неотправленных треков и возвращает их пути"""
+        if self.journal:
+            return self.journal.playlist_failed(uris)
+        return []
             
+    def journal_resolution(self, file_path: str, uri: Optional[str] = None):
+        """Записывает в журнал решение ручного выбора; uri=None означает пропуск файла"""
+        if self.journal:
+            self.journal.write_resolution(file_path, uri)
+            
+    def end_journal(self, **summary):
+        """Завершает журнал запуска итоговой записью
+
+        Журнал остается открытым для решений ручного выбора до начала следующего запуска.
+        """
+        if self.journal:
+            self.journal.close(**summary)
+            
+    def find_resumable_run(self, directory: str) -> Optional[RunState]:
+        """Находит последний запуск для директории, который можно продолжить
+
+        Запуск можно продолжить, если он был прерван, отменен или завершился
+        ошибкой либо в нем остались файлы, ожидающие ручного выбора.
+        """
+        if not os.path.isdir(self.log_dir):
+            return None
+        self.writer.flush()
+        target = os.path.normcase(os.path.abspath(directory))
+        journals = sorted(
+            (name for name in os.listdir(self.log_dir) if name.startswith('journal_') and name.endswith('.jsonl')),
+            reverse=True
+        )
+        for name in journals:
+            try:
+                state = RunJournal.load_state(os.path.join(self.log_dir, name))
+            except OSError as e:
+                self.logger.warning(f"Не удалось прочитать журнал {name}: {str(e)}")
+                continue
+            if not state.directory or os.path.normcase(os.path.abspath(state.directory)) != target:
+                continue
+            # Учитывается только последний запуск для директории
+            if state.playlist_id and (not state.complete or state.manual):
+                return state
+            return None
+        return None
+        
     def save_results(self, playlist_id: str = None, playlist_name: str = "My playlist #1"):
         """Сохраняет результаты в JSON формате"""
         try:
@@ -111,11 +422,12 @@ class Logger:
             with open(self.output_json, 'w', encoding='utf-8') as f:
                 json.dump(result, f, indent=2, ensure_ascii=False)
                 
-            # Добавляем итоговую информацию в output.txt
-            with open(self.output_file, 'a', encoding='utf-8') as f:
-                f.write("\nИтоговая информация:\n")
-                f.write(json.dumps(result, indent=2, ensure_ascii=False))
-                f.write("\n")
+            # Добавляем итоговую информацию в output.txt после всех записей о треках
+            self.writer.write(
+                self.output_file,
+                "\nИтоговая информация:\n" + json.dumps(result, indent=2, ensure_ascii=False) + "\n"
+            )
+            self.writer.flush()
                 
             self.logger.info(f"Сохранено {len(self.tracks_list)} треков в {self.output_json}")
                 
@@ -128,13 +440,7 @@ class Logger:
         self.logger.error(f"Ошибка при обработке {file_path}: {error}")
         
         # Записываем в missing.txt
-        try:
-            with open(self.missing_file, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"[{timestamp}] {os.path.basename(file_path)}\n")
-                f.write(f"  Причина: {error}\n\n")
-        except Exception as e:
-            self.logger.error(f"Ошибка при записи в missing.txt: {e}")
+        self._write_missing(file_path, error)
         
     def log_missing(self, file_path: str, reason: str):
         """Логирует информацию о пропущенном файле"""
@@ -142,13 +448,19 @@ class Logger:
         self.logger.warning(f"Пропущен файл {file_path}. Причина: {reason}")
         
         # Записываем в missing.txt
-        try:
-            with open(self.missing_file, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"[{timestamp}] {os.path.basename(file_path)}\n")
-                f.write(f"  Причина: {reason}\n\n")
-        except Exception as e:
-            self.logger.error(f"Ошибка при записи в missing.txt: {e}")
+        self._write_missing(file_path, reason)
+        
+    def _write_missing(self, file_path: str, reason: str):
+        """Ставит запись о пропущенном файле в очередь на запись в missing.txt"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.writer.write(
+            self.missing_file,
+            f"[{timestamp}] {os.path.basename(file_path)}\n  Причина: {reason}\n\n"
+        )
+        
+    def flush(self):
+        """Дожидается записи всех накопленных строк в output.txt и missing.txt"""
+        self.writer.flush()
         
     def log_info(self, message: str):
         """Логирует информационное сообщение"""
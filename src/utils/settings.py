@@ -0,0 +1,57 @@
+import os
+import json
+from typing import Any, Dict
+
+# Каталог с настройками и служебными файлами приложения
+CONFIG_DIR = os.path.join(os.path.expanduser('~'), '.spotify_merger')
+SETTINGS_PATH = os.path.join(CONFIG_DIR, 'settings.json')
+
+# Значения по умолчанию для параметров запуска
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    'search_workers': 8,  # Максимальное число одновременных поисковых запросов
+    'http_pool_size': 16,  # Размер пула HTTP-соединений к API Spotify
+    'api_rate_limit': 10.0,  # Максимальная частота запросов к API, запросов в секунду
+    'api_burst': 20,  # Допустимый всплеск запросов сверх средней частоты
+    'api_max_retries': 8,  # Число повторов при 429, ошибках 5xx и сбоях сети
+    'api_max_retry_after': 60.0,  # Максимальная пауза по Retry-After; при большей ответ 429 возвращается сразу, в секундах
+    'liked_tracks_workers': 4,  # Число параллельных запросов при загрузке любимых треков
+    'restore_workers': 4,  # Число параллельных запросов при восстановлении из бэкапа
+    'search_cache_ttl': 30 * 24 * 3600,  # Время жизни записи кэша поиска, в секундах
+    'search_cache_max_entries': 100000,  # Максимальное число записей в кэше поиска
+    'playlist_flush_interval': 5.0,  # Максимальная задержка добавления треков в плейлист, в секундах
+    'library_index': True,  # Использовать индекс библиотеки для повторных запусков
+    'metadata_executor': 'process',  # Пул для чтения тегов: 'process' или 'thread'
+    'metadata_workers': None,  # Число процессов для чтения тегов (по умолчанию - число ядер)
+    'metadata_batch_size': 32,  # Число файлов в одном пакете чтения тегов
+    'search_market': 'TR',  # Рынок (код страны) для поиска треков
+    'search_limit': 5,  # Число результатов в обычном поисковом запросе
+    'search_wide_limit': 20,  # Число результатов при расширенном повторном поиске
+    'search_fallback_markets': [],  # Рынки для повторного поиска, если в основном нет уверенного совпадения
+    'match_threshold': 0.9,  # Минимальная уверенность для автоматического выбора трека (0..1)
+    'manual_prefetch_count': 5,  # Для скольких ближайших файлов ручного выбора заранее загружать обложки
+}
+
+def load_settings() -> Dict[str, Any]:
+    """Загружает настройки приложения, дополняя их значениями по умолчанию"""
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if os.path.exists(SETTINGS_PATH):
+            with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                settings.update(data)
+    except Exception:
+        pass
+    return settings
+
+def get_setting(name: str) -> Any:
+    """Возвращает значение одного параметра настроек"""
+    return load_settings().get(name, DEFAULT_SETTINGS.get(name))
+
+def save_settings(settings: Dict[str, Any]) -> None:
+    """Сохраняет настройки приложения"""
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    current = load_settings()
+    current.update(settings)
+    with open(SETTINGS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2, ensure_ascii=False)